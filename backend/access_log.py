@@ -0,0 +1,212 @@
+"""Non-blocking, structured logging.
+
+Log calls on the event loop only enqueue records; a :class:`QueueListener`
+thread formats them as JSON and does the actual I/O.  When the queue is full
+records are dropped (and counted) rather than blocking the loop.
+
+:class:`AccessLogMiddleware` emits one record per request with its request
+ID, route, status, latency and the time spent in MongoDB commands.
+Successful requests are sampled; errors and slow requests are always logged.
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import monitoring
+
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestContext:
+    """Per-request state shared with log records and the MongoDB listener"""
+
+    __slots__ = ("request_id", "db_micros", "db_commands")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.db_micros = 0
+        self.db_commands = 0
+
+
+current_request: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+class DbTimingListener(monitoring.CommandListener):
+    """Adds MongoDB command durations to the current request.
+
+    Motor runs PyMongo in a thread pool with a copy of the caller's context,
+    so the request context is visible from these callbacks.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.duration_micros)
+
+    def failed(self, event):
+        self._record(event.duration_micros)
+
+    @staticmethod
+    def _record(duration_micros: int):
+        context = current_request.get()
+        if context is not None:
+            context.db_micros += duration_micros
+            context.db_commands += 1
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID (runs in the emitting thread)"""
+
+    def filter(self, record):
+        context = current_request.get()
+        record.request_id = context.request_id if context else None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The base class folds the formatted traceback into msg; keep it in
+        # exc_text instead so JsonFormatter can emit it as its own field
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Tracebacks keep frames alive and are not needed once formatted
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level: str = "INFO", queue_size: int = 10000) -> logging.handlers.QueueListener:
+    """Route all logging through a bounded queue drained by a listener thread"""
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # Uvicorn installs its own synchronous stderr handlers; send its logs through the queue
+    # too, and let AccessLogMiddleware replace its plain-text access log.
+    for name in ("uvicorn", "uvicorn.error"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    access_logger = logging.getLogger("uvicorn.access")
+    access_logger.handlers = []
+    access_logger.propagate = False
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class AccessLogMiddleware:
+    """Pure ASGI middleware that logs one structured record per HTTP request"""
+
+    def __init__(self, app, sample_rate: float = 1.0, slow_ms: float = 1000.0, logger_name: str = "access"):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                candidate = value.decode("latin-1")
+                if REQUEST_ID_PATTERN.match(candidate):
+                    request_id = candidate
+                break
+        context = RequestContext(request_id or uuid.uuid4().hex)
+        token = current_request.set(context)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, context.request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            self._log(scope, context, status_code, latency_ms)
+            current_request.reset(token)
+
+    def _log(self, scope, context: RequestContext, status_code: int, latency_ms: float):
+        is_error = status_code >= 400
+        if not is_error and latency_ms < self.slow_ms and random.random() >= self.sample_rate:
+            return
+
+        route = scope.get("route")
+        fields = {
+            "method": scope["method"],
+            "route": getattr(route, "path", None) or scope["path"],
+            "status": status_code,
+            "latency_ms": round(latency_ms, 2),
+            "db_ms": round(context.db_micros / 1000, 2),
+            "db_commands": context.db_commands,
+        }
+        level = logging.ERROR if status_code >= 500 else logging.WARNING if is_error else logging.INFO
+        self.logger.log(level, f"{scope['method']} {fields['route']} {status_code}", extra={"fields": fields})
@@ -0,0 +1,213 @@
+"""Pre-aggregated contact submission analytics.
+
+Every submission increments one daily rollup document per tenant in
+``contact_rollups``::
+
+    {"_id": "default:day:2024-05-01", "tenant": "default",
+     "bucket": datetime(2024, 5, 1), "total": 3,
+     "status": {"new": 3}, "domains": {"gmail%2Ecom": 2, "example%2Eorg": 1}}
+
+Stats over any range read at most one document per day and aggregate them
+with pandas, so cost is independent of how many submissions exist.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+def escape_key(key: str) -> str:
+    """Make an arbitrary string safe to use as a Mongo field name"""
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def unescape_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def day_bucket(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def email_domain(email: str) -> str:
+    return email.rsplit("@", 1)[-1].lower()
+
+
+async def ensure_rollup_indexes(db):
+    await db.contact_rollups.create_index([("tenant", ASCENDING), ("bucket", ASCENDING)], name="tenant_bucket")
+
+
+async def record_contact(db, contact: Dict[str, Any]):
+    """Increment the daily rollup for a newly stored contact submission"""
+    bucket = day_bucket(contact["submitted_at"])
+    await db.contact_rollups.update_one(
+        {"_id": f"{contact['tenant']}:day:{bucket:%Y-%m-%d}"},
+        {
+            "$inc": {
+                "total": 1,
+                f"status.{escape_key(contact['status'])}": 1,
+                f"domains.{escape_key(email_domain(contact['email']))}": 1,
+            },
+            "$setOnInsert": {"tenant": contact["tenant"], "bucket": bucket},
+        },
+        upsert=True,
+    )
+
+
+def _add_to_rollup(rollups: Dict[str, Dict[str, Any]], tenant: str, day: str, status: str, domain: str, count: int):
+    rollup = rollups.setdefault(f"{tenant}:day:{day}", {
+        "_id": f"{tenant}:day:{day}",
+        "tenant": tenant,
+        "bucket": datetime.strptime(day, "%Y-%m-%d"),
+        "total": 0,
+        "status": {},
+        "domains": {},
+    })
+    status, domain = escape_key(status), escape_key(domain)
+    rollup["total"] += count
+    rollup["status"][status] = rollup["status"].get(status, 0) + count
+    rollup["domains"][domain] = rollup["domains"].get(domain, 0) + count
+
+
+async def rebuild_rollups(db, archiver=None, default_tenant: str = "default") -> int:
+    """Recompute all daily rollups from ``contact_submissions`` plus the archived chunks"""
+    pipeline = [
+        {"$group": {
+            "_id": {
+                "tenant": {"$ifNull": ["$tenant", default_tenant]},
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$submitted_at"}},
+                "status": "$status",
+                "domain": {"$toLower": {"$arrayElemAt": [{"$split": ["$email", "@"]}, -1]}},
+            },
+            "count": {"$sum": 1},
+        }},
+    ]
+    rollups: Dict[str, Dict[str, Any]] = {}
+    async for group in db.contact_submissions.aggregate(pipeline):
+        key = group["_id"]
+        _add_to_rollup(rollups, key["tenant"], key["day"], key["status"], key["domain"], group["count"])
+
+    # Submissions past the retention window only exist in the archive
+    archived = 0
+    if archiver is not None:
+        for path in archiver.chunks_between(None, None):
+            records = await asyncio.to_thread(archiver.read_chunk, path, None, None)
+            for record in records:
+                _add_to_rollup(
+                    rollups, record.get("tenant", default_tenant), f"{record['submitted_at']:%Y-%m-%d}",
+                    record.get("status", "new"), email_domain(record["email"]), 1,
+                )
+            archived += len(records)
+
+    if rollups:
+        await db.contact_rollups.bulk_write(
+            [ReplaceOne({"_id": r["_id"]}, r, upsert=True) for r in rollups.values()],
+            ordered=False,
+        )
+    if archived:
+        logger.info(f"Included {archived} archived contact submissions in the rollups")
+    return len(rollups)
+
+
+async def migrate_legacy_rollups(db, default_tenant: str = "default") -> int:
+    """Move pre-tenancy rollups (``_id: "day:..."``, no tenant) to the default tenant in place"""
+    legacy = await db.contact_rollups.find({"tenant": {"$exists": False}}).to_list(None)
+    if not legacy:
+        return 0
+    operations = []
+    for rollup in legacy:
+        # Merged with $inc, as submissions since the upgrade may already have created the new document
+        increments = {"total": rollup.get("total", 0)}
+        for field in ("status", "domains"):
+            for key, count in rollup.get(field, {}).items():
+                increments[f"{field}.{key}"] = count
+        operations.append(UpdateOne(
+            {"_id": f"{default_tenant}:{rollup['_id']}"},
+            {"$inc": increments, "$setOnInsert": {"tenant": default_tenant, "bucket": rollup["bucket"]}},
+            upsert=True,
+        ))
+    await db.contact_rollups.bulk_write(operations, ordered=False)
+    await db.contact_rollups.delete_many({"_id": {"$in": [rollup["_id"] for rollup in legacy]}})
+    logger.info(f"Migrated {len(legacy)} legacy contact rollups to tenant '{default_tenant}'")
+    return len(legacy)
+
+
+async def backfill_rollups(db, archiver=None, default_tenant: str = "default"):
+    """Migrate legacy rollups, or build them if none exist yet.
+
+    Must run before the archiver starts moving submissions, or a submission
+    could be counted both in the hot collection and in an archive chunk.
+    """
+    await migrate_legacy_rollups(db, default_tenant)
+    if await db.contact_rollups.estimated_document_count():
+        return
+    days = await rebuild_rollups(db, archiver, default_tenant)
+    if days:
+        logger.info(f"Backfilled {days} daily contact rollups")
+
+
+async def fetch_rollups(db, tenant: str, since: date, until: date) -> List[Dict[str, Any]]:
+    query = {"tenant": tenant, "bucket": {
+        "$gte": datetime.combine(since, datetime.min.time()),
+        "$lte": datetime.combine(until, datetime.min.time()),
+    }}
+    projection = {"_id": 0, "bucket": 1, "total": 1, "status": 1, "domains": 1}
+    return await db.contact_rollups.find(query, projection).to_list(None)
+
+
+def _sum_counters(counters: Iterable[Dict[str, int]]) -> pd.Series:
+    """Sum a sequence of {key: count} maps into one Series, vectorized over all entries"""
+    keys: List[str] = []
+    counts: List[int] = []
+    for counter in counters:
+        keys.extend(counter.keys())
+        counts.extend(counter.values())
+    if not keys:
+        return pd.Series(dtype="int64")
+
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+    totals = np.bincount(codes, weights=np.asarray(counts, dtype=np.int64), minlength=len(uniques))
+    return pd.Series(totals.astype(np.int64), index=[unescape_key(k) for k in uniques])
+
+
+def compute_stats(rollups: List[Dict[str, Any]], since: date, until: date, top: int = 10) -> Dict[str, Any]:
+    """Turn daily rollup documents into per-day/week series, status counts and top domains"""
+    days = pd.date_range(since, until, freq="D")
+    if rollups:
+        totals = pd.Series(
+            np.fromiter((r.get("total", 0) for r in rollups), dtype=np.int64, count=len(rollups)),
+            index=pd.DatetimeIndex([r["bucket"] for r in rollups]),
+        )
+        per_day = totals.groupby(level=0).sum().reindex(days, fill_value=0)
+    else:
+        per_day = pd.Series(0, index=days, dtype="int64")
+
+    # Weeks start on Monday
+    week_starts = per_day.index - pd.to_timedelta(per_day.index.dayofweek, unit="D")
+    per_week = per_day.groupby(week_starts).sum()
+
+    by_status = _sum_counters(r.get("status", {}) for r in rollups).sort_values(ascending=False)
+    by_domain = _sum_counters(r.get("domains", {}) for r in rollups)
+    top_domains = by_domain.sort_values(ascending=False, kind="stable").head(top)
+
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "total": int(per_day.sum()),
+        "per_day": [{"date": d.date().isoformat(), "count": int(c)} for d, c in per_day.items()],
+        "per_week": [{"week_start": d.date().isoformat(), "count": int(c)} for d, c in per_week.items()],
+        "by_status": {str(k): int(v) for k, v in by_status.items()},
+        "top_domains": [{"domain": str(k), "count": int(v)} for k, v in top_domains.items()],
+    }
+
+
+def default_range(since: Optional[date] = None, until: Optional[date] = None, days: int = 30):
+    until = until or datetime.utcnow().date()
+    since = since or until - timedelta(days=days - 1)
+    return since, until
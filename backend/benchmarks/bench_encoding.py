@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare JSON, MessagePack and CBOR for the PortfolioData payload.
+
+Reports encoded size (raw and gzipped) plus encode/decode time per document.
+Run from the backend directory:
+
+    python benchmarks/bench_encoding.py [--scale N] [--number N]
+"""
+import argparse
+import copy
+import gzip
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import cbor2
+import msgpack
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from encoding import CBOR, JSON, MSGPACK, render  # noqa: E402
+from seed_data import DEFAULT_PORTFOLIO_DATA  # noqa: E402
+
+DECODERS = {
+    JSON: json.loads,
+    MSGPACK: lambda body: msgpack.unpackb(body, raw=False),
+    CBOR: cbor2.loads,
+}
+
+
+def scaled_portfolio(scale: int) -> dict:
+    """Repeat every list section ``scale`` times to model a larger portfolio"""
+    portfolio = copy.deepcopy(DEFAULT_PORTFOLIO_DATA)
+    for key, value in portfolio.items():
+        if isinstance(value, list):
+            portfolio[key] = [dict(item, id=i) if "id" in item else item
+                              for i, item in enumerate(value * scale, start=1)]
+    return portfolio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, help="multiply list sections by N")
+    parser.add_argument("--number", type=int, default=5000, help="iterations per measurement")
+    args = parser.parse_args()
+
+    portfolio = scaled_portfolio(args.scale)
+    print(f"PortfolioData x{args.scale}, {args.number} iterations\n")
+    print(f"{'encoding':<22}{'bytes':>8}{'gzip':>8}{'encode us':>12}{'decode us':>12}")
+
+    for media_type, decode in DECODERS.items():
+        body = render(portfolio, media_type)
+        assert decode(body) == portfolio
+
+        encode_s = timeit.timeit(lambda: render(portfolio, media_type), number=args.number)
+        decode_s = timeit.timeit(lambda: decode(body), number=args.number)
+        print(f"{media_type:<22}{len(body):>8}{len(gzip.compress(body)):>8}"
+              f"{encode_s / args.number * 1e6:>12.1f}{decode_s / args.number * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Per-request middleware overhead: Starlette's CORS/GZip/TrustedHost stack vs EdgeMiddleware.
+
+Both stacks wrap the same trivial ASGI app with the production configuration.
+Before timing, every scenario is run through both stacks and the responses
+(status, headers, decoded body) are compared.  Run from the backend directory:
+
+    python benchmarks/bench_middleware.py [--number N]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.middleware.trustedhost import TrustedHostMiddleware
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from edge import EdgeMiddleware  # noqa: E402
+
+ALLOWED_HOSTS = ["*.onrender.com", "*.vercel.app", "*.netlify.app"]
+CORS_OPTIONS = dict(
+    allow_origins=["https://risheek-portfolio.vercel.app", "https://*.vercel.app", "https://*.netlify.app"],
+    allow_credentials=True,
+    allow_methods=["GET", "POST"],
+    allow_headers=["*"],
+)
+SMALL_BODY = json.dumps({"message": "Risheek N Portfolio API - Ready to serve!", "version": "1.0.0"}).encode()
+LARGE_BODY = json.dumps({"items": [{"id": i, "name": f"item {i}"} for i in range(200)]}).encode()
+
+
+def make_app(body: bytes):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+def starlette_stack(app):
+    # Same order as the middlewares were added in server.py: CORS outermost
+    return CORSMiddleware(GZipMiddleware(TrustedHostMiddleware(app, allowed_hosts=ALLOWED_HOSTS), minimum_size=1000),
+                          **CORS_OPTIONS)
+
+
+def edge_stack(app):
+    return EdgeMiddleware(app, allowed_hosts=ALLOWED_HOSTS, minimum_size=1000, **CORS_OPTIONS)
+
+
+def scope_for(method="GET", headers=()):
+    return {
+        "type": "http", "method": method, "path": "/api/", "raw_path": b"/api/", "root_path": "",
+        "scheme": "https", "query_string": b"", "server": ("api.onrender.com", 443), "client": ("1.2.3.4", 1),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "http_version": "1.1", "asgi": {"version": "3.0"},
+    }
+
+
+SCENARIOS = {
+    "plain GET": (SMALL_BODY, scope_for(headers=[("Host", "api.onrender.com")])),
+    "CORS GET, small body": (SMALL_BODY, scope_for(headers=[
+        ("Host", "api.onrender.com"), ("Origin", "https://risheek-portfolio.vercel.app"),
+        ("Accept-Encoding", "gzip, deflate, br")])),
+    "CORS GET, gzipped body": (LARGE_BODY, scope_for(headers=[
+        ("Host", "api.onrender.com"), ("Origin", "https://risheek-portfolio.vercel.app"),
+        ("Accept-Encoding", "gzip, deflate, br")])),
+    "preflight": (SMALL_BODY, scope_for("OPTIONS", headers=[
+        ("Host", "api.onrender.com"), ("Origin", "https://risheek-portfolio.vercel.app"),
+        ("Access-Control-Request-Method", "POST"), ("Access-Control-Request-Headers", "content-type")])),
+    "invalid host": (SMALL_BODY, scope_for(headers=[("Host", "evil.example.com")])),
+}
+
+
+async def run_once(stack, scope):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await stack(dict(scope), receive, send)
+    return messages
+
+
+def normalize(messages):
+    start = messages[0]
+    headers = dict((k.decode(), v.decode()) for k, v in start["headers"])
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    if headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+        headers.pop("content-length")
+    return start["status"], headers, body
+
+
+async def check_parity():
+    for name, (body, scope) in SCENARIOS.items():
+        app = make_app(body)
+        expected = normalize(await run_once(starlette_stack(app), scope))
+        actual = normalize(await run_once(edge_stack(app), scope))
+        assert expected == actual, f"{name}: {expected} != {actual}"
+    print("parity: responses identical for all scenarios\n")
+
+
+async def measure(stack, scope, number):
+    for _ in range(100):
+        await run_once(stack, scope)
+    start = time.perf_counter()
+    for _ in range(number):
+        await run_once(stack, scope)
+    return (time.perf_counter() - start) / number * 1e6
+
+
+async def main(number):
+    await check_parity()
+    print(f"{'scenario':<26}{'app only us':>12}{'starlette us':>14}{'edge us':>10}{'saved':>8}")
+    for name, (body, scope) in SCENARIOS.items():
+        app = make_app(body)
+        bare = await measure(app, scope, number)
+        before = await measure(starlette_stack(app), scope, number)
+        after = await measure(edge_stack(app), scope, number)
+        print(f"{name:<26}{bare:>12.1f}{before:>14.1f}{after:>10.1f}{(before - after) / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000, help="requests per measurement")
+    asyncio.run(main(parser.parse_args().number))
@@ -0,0 +1,343 @@
+"""Single pure-ASGI middleware for host checking, CORS and compression.
+
+Behaves like Starlette's ``CORSMiddleware(GZipMiddleware(TrustedHostMiddleware(app)))``
+stack, but parses request headers once, matches hosts and origins against
+precomputed sets, replays cached preflight responses, and picks the gzip
+threshold from the response content type (already-compressed media is never
+gzipped).
+"""
+import gzip
+import io
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import URL
+from starlette.responses import PlainTextResponse, RedirectResponse
+
+ALL_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
+SAFELISTED_HEADERS = {"Accept", "Accept-Language", "Content-Language", "Content-Type"}
+
+# Media that is already compressed; gzip only costs CPU here
+INCOMPRESSIBLE_PREFIXES = ("image/", "audio/", "video/", "font/woff")
+INCOMPRESSIBLE_TYPES = {"application/gzip", "application/zip", "application/x-gzip", "application/pdf"}
+# Binary encodings shrink less under gzip, so only bother for larger bodies
+DEFAULT_TYPE_MINIMUM_SIZES = {
+    "application/msgpack": 4096,
+    "application/cbor": 4096,
+}
+
+RawHeaders = List[Tuple[bytes, bytes]]
+
+
+def _get_header(headers: RawHeaders, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+
+def _set_header(headers: RawHeaders, name: bytes, value: bytes):
+    """Same semantics as ``MutableHeaders.__setitem__``"""
+    found = None
+    for index in reversed(range(len(headers))):
+        if headers[index][0] == name:
+            if found is not None:
+                del headers[found]
+            found = index
+    if found is None:
+        headers.append((name, value))
+    else:
+        headers[found] = (name, value)
+
+
+def _del_header(headers: RawHeaders, name: bytes):
+    headers[:] = [(key, value) for key, value in headers if key != name]
+
+
+def _add_vary(headers: RawHeaders, value: bytes):
+    vary = _get_header(headers, b"vary")
+    _set_header(headers, b"vary", vary + b", " + value if vary is not None else value)
+
+
+class EdgeMiddleware:
+    def __init__(
+        self,
+        app,
+        allowed_hosts: Sequence[str] = ("*",),
+        host_validator: Optional[Callable[[str], bool]] = None,
+        www_redirect: bool = True,
+        allow_origins: Sequence[str] = (),
+        allow_methods: Sequence[str] = ("GET",),
+        allow_headers: Sequence[str] = (),
+        allow_credentials: bool = False,
+        allow_origin_regex: Optional[str] = None,
+        expose_headers: Sequence[str] = (),
+        max_age: int = 600,
+        minimum_size: int = 500,
+        compresslevel: int = 6,
+        type_minimum_sizes: Optional[Dict[str, int]] = None,
+        preflight_cache_size: int = 256,
+    ):
+        self.app = app
+
+        # Hosts: exact names, "*.domain" suffixes, or anything
+        self.allow_any_host = "*" in allowed_hosts
+        self.exact_hosts = frozenset(h for h in allowed_hosts if not h.startswith("*"))
+        self.host_suffixes = tuple(h[1:] for h in allowed_hosts if h.startswith("*."))
+        # Consulted for hosts not in the static list (e.g. tenant custom domains)
+        self.host_validator = host_validator
+        self.www_redirect = www_redirect
+
+        # CORS, precomputed as in Starlette's CORSMiddleware
+        if "*" in allow_methods:
+            allow_methods = ALL_METHODS
+        self.allow_methods = frozenset(allow_methods)
+        self.allow_all_origins = "*" in allow_origins
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_origin_regex = re.compile(allow_origin_regex) if allow_origin_regex else None
+        self.allow_all_headers = "*" in allow_headers
+        self.allow_credentials = allow_credentials
+        self.preflight_explicit_allow_origin = not self.allow_all_origins or allow_credentials
+
+        simple_headers = []
+        if self.allow_all_origins:
+            simple_headers.append((b"access-control-allow-origin", b"*"))
+        if allow_credentials:
+            simple_headers.append((b"access-control-allow-credentials", b"true"))
+        if expose_headers:
+            simple_headers.append((b"access-control-expose-headers", ", ".join(expose_headers).encode("latin-1")))
+        self.simple_headers = simple_headers
+
+        preflight_headers = {}
+        if self.preflight_explicit_allow_origin:
+            preflight_headers["Vary"] = "Origin"
+        else:
+            preflight_headers["Access-Control-Allow-Origin"] = "*"
+        preflight_headers["Access-Control-Allow-Methods"] = ", ".join(allow_methods)
+        preflight_headers["Access-Control-Max-Age"] = str(max_age)
+        sorted_headers = sorted(SAFELISTED_HEADERS | set(allow_headers))
+        if sorted_headers and not self.allow_all_headers:
+            preflight_headers["Access-Control-Allow-Headers"] = ", ".join(sorted_headers)
+        if allow_credentials:
+            preflight_headers["Access-Control-Allow-Credentials"] = "true"
+        self.preflight_headers = preflight_headers
+        self.allow_header_names = frozenset(h.lower() for h in sorted_headers)
+
+        self.preflight_cache: "OrderedDict[Tuple[str, str, Optional[str]], Tuple[int, RawHeaders, bytes]]" = OrderedDict()
+        self.preflight_cache_size = preflight_cache_size
+
+        # Compression
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.type_minimum_sizes = dict(DEFAULT_TYPE_MINIMUM_SIZES, **(type_minimum_sizes or {}))
+
+    async def __call__(self, scope, receive, send):
+        scope_type = scope["type"]
+        if scope_type != "http":
+            if scope_type == "websocket" and not self.is_allowed_host(self._scope_host(scope)):
+                await send({"type": "websocket.close", "code": 1008})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        host = origin = request_method = request_headers = accept_encoding = None
+        has_cookie = False
+        for name, value in scope["headers"]:
+            if name == b"host":
+                if host is None:
+                    host = value.decode("latin-1")
+            elif name == b"origin":
+                if origin is None:
+                    origin = value.decode("latin-1")
+            elif name == b"accept-encoding":
+                if accept_encoding is None:
+                    accept_encoding = value
+            elif name == b"access-control-request-method":
+                if request_method is None:
+                    request_method = value.decode("latin-1")
+            elif name == b"access-control-request-headers":
+                if request_headers is None:
+                    request_headers = value.decode("latin-1")
+            elif name == b"cookie":
+                has_cookie = True
+
+        if origin is not None and request_method is not None and scope["method"] == "OPTIONS":
+            status, headers, body = self.preflight(origin, request_method, request_headers)
+            await send({"type": "http.response.start", "status": status, "headers": list(headers)})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        accepts_gzip = accept_encoding is not None and b"gzip" in accept_encoding
+        host_name = (host or "").split(":")[0]
+        if origin is None and not accepts_gzip:
+            # Nothing to rewrite on the way out
+            if self.allow_any_host or self.is_allowed_host(host_name):
+                await self.app(scope, receive, send)
+            else:
+                await self.reject_host(scope, receive, send, host_name)
+            return
+
+        responder = _Responder(self, send, origin, has_cookie, accepts_gzip)
+        if self.allow_any_host or self.is_allowed_host(host_name):
+            await self.app(scope, receive, responder.send)
+        else:
+            await self.reject_host(scope, receive, responder.send, host_name)
+
+    # Hosts
+    @staticmethod
+    def _scope_host(scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"host":
+                return value.decode("latin-1").split(":")[0]
+        return ""
+
+    def is_allowed_host(self, host: str) -> bool:
+        if self.allow_any_host or host in self.exact_hosts or host.endswith(self.host_suffixes):
+            return True
+        return self.host_validator is not None and self.host_validator(host)
+
+    async def reject_host(self, scope, receive, send, host: str):
+        if self.www_redirect and "www." + host in self.exact_hosts:
+            url = URL(scope=scope)
+            response = RedirectResponse(url=str(url.replace(netloc="www." + url.netloc)))
+        else:
+            response = PlainTextResponse("Invalid host header", status_code=400)
+        await response(scope, receive, send)
+
+    # CORS
+    def is_allowed_origin(self, origin: str) -> bool:
+        if self.allow_all_origins:
+            return True
+        if self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(origin):
+            return True
+        return origin in self.allow_origins
+
+    def preflight(self, origin: str, method: str, requested_headers: Optional[str]) -> Tuple[int, RawHeaders, bytes]:
+        key = (origin, method, requested_headers)
+        cached = self.preflight_cache.get(key)
+        if cached is not None:
+            self.preflight_cache.move_to_end(key)
+            return cached
+
+        headers = dict(self.preflight_headers)
+        failures = []
+        if self.is_allowed_origin(origin):
+            if self.preflight_explicit_allow_origin:
+                headers["Access-Control-Allow-Origin"] = origin
+        else:
+            failures.append("origin")
+        if method not in self.allow_methods:
+            failures.append("method")
+        if self.allow_all_headers and requested_headers is not None:
+            headers["Access-Control-Allow-Headers"] = requested_headers
+        elif requested_headers is not None:
+            for header in requested_headers.lower().split(","):
+                if header.strip() not in self.allow_header_names:
+                    failures.append("headers")
+                    break
+
+        if failures:
+            response = PlainTextResponse("Disallowed CORS " + ", ".join(failures), status_code=400, headers=headers)
+        else:
+            response = PlainTextResponse("OK", status_code=200, headers=headers)
+
+        cached = (response.status_code, response.raw_headers, response.body)
+        self.preflight_cache[key] = cached
+        if len(self.preflight_cache) > self.preflight_cache_size:
+            self.preflight_cache.popitem(last=False)
+        return cached
+
+    # Compression
+    def compression_threshold(self, content_type: Optional[bytes]) -> Optional[int]:
+        """Minimum body size worth compressing, or None if the type should never be compressed"""
+        if content_type is None:
+            return self.minimum_size
+        media_type = content_type.split(b";", 1)[0].strip().decode("latin-1").lower()
+        if media_type in INCOMPRESSIBLE_TYPES or media_type.startswith(INCOMPRESSIBLE_PREFIXES):
+            return None
+        return self.type_minimum_sizes.get(media_type, self.minimum_size)
+
+
+class _Responder:
+    """Per-request send wrapper applying compression, then CORS headers"""
+
+    __slots__ = ("edge", "downstream", "origin", "has_cookie", "accepts_gzip",
+                 "start_message", "started", "passthrough", "threshold", "gzip_buffer", "gzip_file")
+
+    def __init__(self, edge: EdgeMiddleware, send, origin: Optional[str], has_cookie: bool, accepts_gzip: bool):
+        self.edge = edge
+        self.downstream = send
+        self.origin = origin
+        self.has_cookie = has_cookie
+        self.accepts_gzip = accepts_gzip
+        self.start_message = None
+        self.started = False
+        self.passthrough = True
+        self.threshold = None
+        self.gzip_buffer = None
+        self.gzip_file = None
+
+    def apply_cors(self, headers: RawHeaders):
+        edge = self.edge
+        for name, value in edge.simple_headers:
+            _set_header(headers, name, value)
+        origin = self.origin
+        if (edge.allow_all_origins and self.has_cookie) or (
+            not edge.allow_all_origins and edge.is_allowed_origin(origin)
+        ):
+            _set_header(headers, b"access-control-allow-origin", origin.encode("latin-1"))
+            _add_vary(headers, b"Origin")
+
+    async def send_start(self):
+        self.started = True
+        if self.origin is not None:
+            self.apply_cors(self.start_message["headers"])
+        await self.downstream(self.start_message)
+
+    async def send(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            headers = list(message.get("headers", []))
+            self.start_message = {**message, "headers": headers}
+            if self.accepts_gzip and _get_header(headers, b"content-encoding") is None:
+                self.threshold = self.edge.compression_threshold(_get_header(headers, b"content-type"))
+                self.passthrough = self.threshold is None
+            if self.passthrough:
+                await self.send_start()
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = self.start_message["headers"]
+
+        if not self.started:
+            if len(body) < self.threshold and not more_body:
+                await self.send_start()
+                await self.downstream(message)
+                return
+
+            self.gzip_buffer = io.BytesIO()
+            self.gzip_file = gzip.GzipFile(mode="wb", fileobj=self.gzip_buffer, compresslevel=self.edge.compresslevel)
+
+        self.gzip_file.write(body)
+        if not more_body:
+            self.gzip_file.close()
+        compressed = self.gzip_buffer.getvalue()
+        self.gzip_buffer.seek(0)
+        self.gzip_buffer.truncate()
+
+        if not self.started:
+            _set_header(headers, b"content-encoding", b"gzip")
+            if more_body:
+                _add_vary(headers, b"Accept-Encoding")
+                _del_header(headers, b"content-length")
+            else:
+                _set_header(headers, b"content-length", str(len(compressed)).encode("latin-1"))
+                _add_vary(headers, b"Accept-Encoding")
+            await self.send_start()
+        await self.downstream({**message, "body": compressed})
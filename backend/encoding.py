@@ -0,0 +1,73 @@
+"""Response body encodings selected through the ``Accept`` header.
+
+JSON stays the default; internal consumers can ask for MessagePack or CBOR
+from the same routes.  Payloads are passed through ``jsonable_encoder`` first
+so every encoding carries exactly the same values (datetimes as ISO strings).
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+import cbor2
+import msgpack
+from fastapi.responses import Response
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+SUPPORTED_TYPES = {
+    JSON: JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    CBOR: CBOR,
+}
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in accept.split(","):
+        media_range, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_range:
+            ranges.append((media_range.lower(), quality))
+    return ranges
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the best supported media type for an Accept header (JSON unless asked otherwise)"""
+    if not accept:
+        return JSON
+    best, best_quality = JSON, 0.0
+    for media_range, quality in _parse_accept(accept):
+        media_type = SUPPORTED_TYPES.get(media_range)
+        if media_type is None and media_range in ("*/*", "application/*"):
+            media_type = JSON
+        # Earlier entries win ties, as clients list their preference first
+        if media_type is not None and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def render(content: Any, media_type: str) -> bytes:
+    """Encode an already JSON-compatible payload"""
+    if media_type == MSGPACK:
+        return msgpack.packb(content, use_bin_type=True)
+    if media_type == CBOR:
+        return cbor2.dumps(content)
+    # Same settings as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class EncodedResponse(Response):
+    """A pre-rendered body that varies by the request's Accept header"""
+
+    def __init__(self, body: bytes, media_type: str, status_code: int = 200):
+        super().__init__(content=body, status_code=status_code, media_type=media_type, headers={"Vary": "Accept"})
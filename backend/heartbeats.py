@@ -0,0 +1,251 @@
+"""Time-bucketed rollups for legacy status heartbeats.
+
+``POST /api/status`` only increments an in-memory counter per client and
+minute.  :class:`HeartbeatAggregator` periodically flushes those counters as
+upserts into ``status_rollups`` at three granularities:
+
+* ``minute`` buckets hold the heartbeat count (kept for 7 days),
+* ``hour`` and ``day`` buckets also count the distinct active minutes, which
+  gives uptime as ``active_minutes / minutes in bucket`` (kept 90 days/forever).
+
+``status_clients`` keeps one document per client with its last-seen time.
+The number of writes per flush depends on the number of active clients and
+buckets, not on how often clients send heartbeats.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+BUCKET_MINUTES = {"minute": 1, "hour": 60, "day": 1440}
+ROLLUP_RETENTION = {"minute": timedelta(days=7), "hour": timedelta(days=90), "day": None}
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _rollup_update(client_name: str, granularity: str, bucket: datetime, count: int,
+                   last_seen: datetime, active_minutes: Optional[int] = None) -> UpdateOne:
+    on_insert: Dict[str, Any] = {"client_name": client_name, "granularity": granularity, "bucket": bucket}
+    retention = ROLLUP_RETENTION[granularity]
+    if retention is not None:
+        on_insert["expires_at"] = bucket + retention
+    increments = {"count": count}
+    if active_minutes:
+        increments["active_minutes"] = active_minutes
+    return UpdateOne(
+        {"_id": {"client": client_name, "granularity": granularity, "bucket": bucket}},
+        {"$inc": increments, "$max": {"last_seen": last_seen}, "$setOnInsert": on_insert},
+        upsert=True,
+    )
+
+
+async def ensure_heartbeat_indexes(db):
+    await db.status_rollups.create_index(
+        [("granularity", ASCENDING), ("client_name", ASCENDING), ("bucket", ASCENDING)],
+        name="granularity_client_bucket",
+    )
+    await db.status_rollups.create_index([("expires_at", ASCENDING)], name="rollup_ttl", expireAfterSeconds=0)
+
+
+def _merge(target: Dict[Any, List], key: Any, entry: List):
+    """Add a [count, last_seen, (active_minutes)] entry into ``target``"""
+    current = target.get(key)
+    if current is None:
+        target[key] = list(entry)
+        return
+    current[0] += entry[0]
+    current[1] = max(current[1], entry[1])
+    for index in range(2, len(entry)):
+        current[index] += entry[index]
+
+
+def _failed_indexes(error: Exception, total: int) -> Set[int]:
+    """Operations of a failed unordered bulk write that were not applied"""
+    if isinstance(error, BulkWriteError):
+        return {write_error["index"] for write_error in error.details.get("writeErrors", [])}
+    # Outcome unknown (e.g. a primary step-down): retry all of them, which
+    # counts twice any that had in fact been applied
+    return set(range(total))
+
+
+class HeartbeatAggregator:
+    """Counts heartbeats in memory and flushes them as rollup upserts.
+
+    Nothing is dropped when a write fails: unwritten minute counters go back
+    into the pending counters, and hour/day and per-client increments (which
+    are derived from successfully written minutes) are kept in their own
+    retry buffers.  Operations reported as failed by a ``BulkWriteError`` are
+    retried exactly; when the outcome of a bulk write is unknown (e.g. a
+    network error), all of its operations are retried, so counts are
+    at-least-once and may occasionally be counted twice.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # (client_name, minute bucket) -> [count, last seen]
+        self._pending: Dict[Tuple[str, datetime], List] = {}
+        # (client_name, granularity, bucket) -> [count, last seen, new active minutes]
+        self._coarse: Dict[Tuple[str, str, datetime], List] = {}
+        # client_name -> [count, last seen]
+        self._clients: Dict[str, List] = {}
+
+    def record(self, client_name: str, timestamp: datetime):
+        key = (client_name, bucket_start(timestamp, "minute"))
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = [1, timestamp]
+        else:
+            entry[0] += 1
+            if timestamp > entry[1]:
+                entry[1] = timestamp
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        """Write pending counters; returns the number of minute buckets flushed"""
+        flushed = await self._flush_minutes() if self._pending else 0
+        if self._coarse or self._clients:
+            await self._flush_rollups()
+        return flushed
+
+    async def _flush_minutes(self) -> int:
+        pending, self._pending = self._pending, {}
+        keys = list(pending)
+        minute_ops = [
+            _rollup_update(client_name, "minute", minute, *pending[(client_name, minute)])
+            for client_name, minute in keys
+        ]
+        error: Optional[Exception] = None
+        failed: Set[int] = set()
+        try:
+            result = await self.db.status_rollups.bulk_write(minute_ops, ordered=False)
+            upserted = set(result.upserted_ids)
+        except Exception as e:
+            error, failed = e, _failed_indexes(e, len(keys))
+            upserted = {u["index"] for u in e.details.get("upserted", [])} if isinstance(e, BulkWriteError) else set()
+
+        for index, key in enumerate(keys):
+            if index in failed:
+                _merge(self._pending, key, pending[key])
+                continue
+            client_name, minute = key
+            count, last_seen = pending[key]
+            # A minute bucket that had to be inserted was not active before this flush
+            new_minute = int(index in upserted)
+            for granularity in ("hour", "day"):
+                _merge(self._coarse, (client_name, granularity, bucket_start(minute, granularity)),
+                       [count, last_seen, new_minute])
+            _merge(self._clients, client_name, [count, last_seen])
+
+        if error is not None:
+            raise error
+        return len(keys)
+
+    async def _flush_rollups(self):
+        coarse, self._coarse = self._coarse, {}
+        clients, self._clients = self._clients, {}
+
+        coarse_keys = list(coarse)
+        coarse_ops = [
+            _rollup_update(client_name, granularity, bucket, *coarse[(client_name, granularity, bucket)])
+            for client_name, granularity, bucket in coarse_keys
+        ]
+        client_keys = list(clients)
+        client_ops = [
+            UpdateOne(
+                {"_id": client_name},
+                {"$inc": {"total": clients[client_name][0]}, "$max": {"last_seen": clients[client_name][1]},
+                 "$setOnInsert": {"client_name": client_name}},
+                upsert=True,
+            )
+            for client_name in client_keys
+        ]
+
+        error: Optional[Exception] = None
+        for collection, keys, ops, pending, retry in (
+            (self.db.status_rollups, coarse_keys, coarse_ops, coarse, self._coarse),
+            (self.db.status_clients, client_keys, client_ops, clients, self._clients),
+        ):
+            if not ops:
+                continue
+            try:
+                await collection.bulk_write(ops, ordered=False)
+            except Exception as e:
+                error = e
+                for index in _failed_indexes(e, len(keys)):
+                    _merge(retry, keys[index], pending[keys[index]])
+        if error is not None:
+            raise error
+
+    async def run_forever(self, interval_seconds: float):
+        """Flush on a fixed interval until cancelled, then flush what is left"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error(f"Heartbeat rollup flush failed (counts kept for the next flush): {e}")
+        finally:
+            await self.flush()
+
+
+async def query_rollups(db, granularity: str, since: datetime, until: datetime,
+                        client_name: Optional[str] = None, limit: int = 10000) -> Dict[str, Any]:
+    """Last-seen times and per-client count/uptime series from the rollups"""
+    client_query = {"_id": client_name} if client_name else {}
+    clients = await db.status_clients.find(client_query, {"_id": 0}).sort("client_name", 1).to_list(None)
+
+    rollup_query: Dict[str, Any] = {"granularity": granularity, "bucket": {"$gte": since, "$lte": until}}
+    if client_name:
+        rollup_query["client_name"] = client_name
+    projection = {"_id": 0, "client_name": 1, "bucket": 1, "count": 1, "active_minutes": 1, "last_seen": 1}
+    rollups = await db.status_rollups.find(rollup_query, projection).sort(
+        [("client_name", 1), ("bucket", 1)]
+    ).to_list(limit)
+
+    minutes_per_bucket = BUCKET_MINUTES[granularity]
+    window_minutes = max(1, int((until - since).total_seconds() // 60))
+    series: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    active_in_window: Dict[str, int] = defaultdict(int)
+    for rollup in rollups:
+        # Every stored minute bucket is, by definition, an active minute
+        active = rollup.get("active_minutes", 1) if minutes_per_bucket > 1 else 1
+        active_in_window[rollup["client_name"]] += active
+        series[rollup["client_name"]].append({
+            "bucket": rollup["bucket"],
+            "count": rollup["count"],
+            "uptime": round(active / minutes_per_bucket, 4),
+            "last_seen": rollup["last_seen"],
+        })
+
+    return {
+        "granularity": granularity,
+        "since": since,
+        "until": until,
+        "truncated": len(rollups) >= limit,
+        "clients": [
+            {
+                "client_name": client["client_name"],
+                "last_seen": client["last_seen"],
+                "total": client["total"],
+                "uptime": round(min(1.0, active_in_window.get(client["client_name"], 0) / window_minutes), 4),
+                "series": series.get(client["client_name"], []),
+            }
+            for client in clients
+        ],
+    }
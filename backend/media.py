@@ -0,0 +1,288 @@
+"""Content-addressed image cache with resized WebP/JPEG variants.
+
+Source images are ingested once into
+``<MEDIA_ROOT>/originals`` under the SHA-256 of their bytes.  Variants are
+rendered in a process pool into ``<MEDIA_ROOT>/variants/<hash>/<width>.<ext>``
+and served from ``/api/media/{hash}/{width}``.
+
+Portfolio documents can be written through the API, so sources are
+restricted: remote images only from the configured hosts (no redirects,
+streamed under a byte cap), local images only from the fixture directory.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Media type -> (file extension, Pillow format)
+VARIANT_FORMATS = {
+    "image/webp": ("webp", "WEBP"),
+    "image/jpeg": ("jpg", "JPEG"),
+}
+
+# Width used when rewriting each image field of the portfolio document
+FIELD_WIDTHS = {
+    "projects": 400,
+    "testimonials": 100,
+}
+
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+
+def host_allowed(host: str, allowed_hosts: Iterable[str]) -> bool:
+    """Match a hostname against exact names and ``*.example.com`` patterns"""
+    host = (host or "").lower().rstrip(".")
+    for pattern in allowed_hosts:
+        if pattern.startswith("*.") and host.endswith(pattern[1:]):
+            return True
+        if host == pattern:
+            return True
+    return False
+
+
+def _render_variant(source: str, target: str, width: int, pil_format: str) -> int:
+    """Resize ``source`` to ``width`` and write it to ``target`` (runs in a worker process)"""
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        buffer = io.BytesIO()
+        if pil_format == "WEBP":
+            img.save(buffer, pil_format, quality=80, method=4)
+        else:
+            img.save(buffer, pil_format, quality=82, optimize=True, progressive=True)
+
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, target)
+    return buffer.tell()
+
+
+class MediaStore:
+    """On-disk, content-addressed store of source images and their variants"""
+
+    def __init__(self, root: Path, widths: Iterable[int], max_workers: Optional[int] = None,
+                 allowed_hosts: Iterable[str] = (), fixture_dir: Optional[Path] = None):
+        self.root = Path(root)
+        self.allowed_hosts = [host.strip().lower() for host in allowed_hosts if host.strip()]
+        self.fixture_dir = Path(fixture_dir).resolve() if fixture_dir else None
+        self.widths = sorted(set(widths))
+        self.max_workers = max_workers
+        self.originals_dir = self.root / "originals"
+        self.variants_dir = self.root / "variants"
+        self.manifest_path = self.root / "sources.json"
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._sources: Dict[str, str] = {}
+        self._pending: Dict[Tuple[str, int, str], asyncio.Future] = {}
+        self._manifest_lock: Optional[asyncio.Lock] = None
+
+    def open(self):
+        """Create the directory layout and load the source URL manifest"""
+        self.originals_dir.mkdir(parents=True, exist_ok=True)
+        self.variants_dir.mkdir(parents=True, exist_ok=True)
+        if self.manifest_path.exists():
+            try:
+                self._sources = json.loads(self.manifest_path.read_text())
+            except ValueError:
+                logger.warning(f"Ignoring corrupt media manifest at {self.manifest_path}")
+                self._sources = {}
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    # Paths
+    def original_path(self, digest: str) -> Path:
+        return self.originals_dir / digest[:2] / digest
+
+    def variant_path(self, digest: str, width: int, media_type: str) -> Path:
+        ext, _ = VARIANT_FORMATS[media_type]
+        return self.variants_dir / digest / f"{width}.{ext}"
+
+    def has_original(self, digest: str) -> bool:
+        return self.original_path(digest).exists()
+
+    def lookup(self, source: str) -> Optional[str]:
+        """Return the content hash of an already ingested source, if any"""
+        return self._sources.get(source)
+
+    # Ingestion
+    def _store_original(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.original_path(digest)
+        if not path.exists():
+            # Reject anything Pillow cannot decode before it enters the store
+            with Image.open(io.BytesIO(data)) as img:
+                img.verify()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_source(self, source: str) -> bytes:
+        parsed = urlparse(source)
+        if parsed.scheme in ("http", "https"):
+            return self._download(source, parsed.hostname)
+        if parsed.scheme in ("", "file"):
+            return self._read_fixture(parsed.path if parsed.scheme == "file" else source)
+        raise ValueError(f"Unsupported image source scheme '{parsed.scheme}'")
+
+    def _download(self, url: str, host: Optional[str]) -> bytes:
+        if not host_allowed(host, self.allowed_hosts):
+            raise ValueError(f"Image host '{host}' is not in the allowed media hosts")
+        # Redirects are not followed: they could point anywhere, including internal addresses
+        with requests.get(url, timeout=15, stream=True, allow_redirects=False) as response:
+            if response.status_code != 200:
+                raise ValueError(f"Unexpected status {response.status_code} fetching image")
+            declared = int(response.headers.get("Content-Length") or 0)
+            if declared > MAX_SOURCE_BYTES:
+                raise ValueError(f"Source image too large ({declared} bytes)")
+            buffer = bytearray()
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_BYTES):
+                buffer.extend(chunk)
+                if len(buffer) > MAX_SOURCE_BYTES:
+                    raise ValueError(f"Source image larger than {MAX_SOURCE_BYTES} bytes")
+        return bytes(buffer)
+
+    def _read_fixture(self, path: str) -> bytes:
+        if self.fixture_dir is None:
+            raise ValueError("Local image sources are disabled (no fixture directory configured)")
+        resolved = (self.fixture_dir / path).resolve()
+        if not resolved.is_relative_to(self.fixture_dir) or not resolved.is_file():
+            raise ValueError(f"Local image source '{path}' is not a file in the fixture directory")
+        size = resolved.stat().st_size
+        if size > MAX_SOURCE_BYTES:
+            raise ValueError(f"Source image too large ({size} bytes)")
+        return resolved.read_bytes()
+
+    def _write_manifest(self, payload: str):
+        tmp_path = self.manifest_path.with_name(f"{self.manifest_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(payload)
+        os.replace(tmp_path, self.manifest_path)
+
+    async def _save_manifest(self):
+        # Serialize on the event loop, where the manifest is mutated, and write
+        # one snapshot at a time so an older one can never replace a newer one
+        if self._manifest_lock is None:
+            # Created lazily so it belongs to the running event loop
+            self._manifest_lock = asyncio.Lock()
+        async with self._manifest_lock:
+            payload = json.dumps(self._sources, indent=2, sort_keys=True)
+            await asyncio.to_thread(self._write_manifest, payload)
+
+    async def ingest(self, source: str) -> str:
+        """Ingest a remote URL or fixture file path and pre-render all variants"""
+        digest = self._sources.get(source)
+        if digest is None or not self.has_original(digest):
+            data = await asyncio.to_thread(self._read_source, source)
+            digest = await asyncio.to_thread(self._store_original, data)
+            self._sources[source] = digest
+            await self._save_manifest()
+
+        await asyncio.gather(*(
+            self.ensure_variant(digest, width, media_type)
+            for width in self.widths
+            for media_type in VARIANT_FORMATS
+        ))
+        return digest
+
+    async def ingest_many(self, sources: Iterable[str]) -> Dict[str, str]:
+        """Ingest several sources, logging (not raising) individual failures"""
+        ingested = {}
+        for source in sources:
+            try:
+                ingested[source] = await self.ingest(source)
+            except Exception as e:
+                logger.warning(f"Failed to ingest image {source}: {e}")
+        return ingested
+
+    # Variants
+    async def ensure_variant(self, digest: str, width: int, media_type: str) -> Path:
+        """Return the variant path, rendering it in the process pool if missing"""
+        target = self.variant_path(digest, width, media_type)
+        if target.exists():
+            return target
+
+        key = (digest, width, media_type)
+        pending = self._pending.get(key)
+        if pending is None:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _, pil_format = VARIANT_FORMATS[media_type]
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(
+                self.pool, _render_variant,
+                str(self.original_path(digest)), str(target), width, pil_format
+            )
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        await asyncio.shield(pending)
+        return target
+
+    # Portfolio integration
+    def media_url(self, source: str, width: int, base_url: str = "") -> Optional[str]:
+        digest = self.lookup(source)
+        if digest is None:
+            return None
+        width = min((w for w in self.widths if w >= width), default=self.widths[-1])
+        return f"{base_url.rstrip('/')}/api/media/{digest}/{width}"
+
+    def rewrite_portfolio(self, portfolio: Dict[str, Any], base_url: str = "") -> Dict[str, Any]:
+        """Return a copy of the portfolio with ingested image URLs pointing at /api/media"""
+        rewritten = dict(portfolio)
+        if "projects" in portfolio:
+            rewritten["projects"] = self.rewrite_items(
+                portfolio["projects"], "image", FIELD_WIDTHS["projects"], base_url
+            )
+        if "testimonials" in portfolio:
+            rewritten["testimonials"] = self.rewrite_items(
+                portfolio["testimonials"], "avatar", FIELD_WIDTHS["testimonials"], base_url
+            )
+        return rewritten
+
+    def rewrite_items(self, items: List[Dict[str, Any]], field: str, width: int,
+                      base_url: str = "") -> List[Dict[str, Any]]:
+        rewritten = []
+        for item in items:
+            url = self.media_url(item.get(field, ""), width, base_url)
+            rewritten.append({**item, field: url} if url else item)
+        return rewritten
+
+
+def portfolio_image_sources(portfolio: Dict[str, Any]) -> List[str]:
+    """Collect every image URL referenced by a portfolio document"""
+    sources = [p.get("image") for p in portfolio.get("projects", [])]
+    sources += [t.get("avatar") for t in portfolio.get("testimonials", [])]
+    return [s for s in dict.fromkeys(sources) if s]
+
+
+def negotiate_image_type(accept: str) -> str:
+    """Prefer WebP when the client advertises it, otherwise fall back to JPEG"""
+    return "image/webp" if "image/webp" in (accept or "") else "image/jpeg"
@@ -0,0 +1,80 @@
+"""Server-rendered HTML snapshot of a portfolio.
+
+The page is rendered from ``templates/portfolio.html`` once per tenant
+snapshot and kept, together with a gzip copy and its ETag, in the snapshot's
+derived artifacts, so serving it is a dictionary lookup plus a write.
+"""
+import gzip
+import hashlib
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+URL_SCHEME_PATTERN = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+def safe_url(value: str) -> str:
+    """Only let http(s) and relative URLs into href/src attributes"""
+    value = (value or "").strip()
+    if value.startswith(("http://", "https://", "/", "#")):
+        return value
+    if URL_SCHEME_PATTERN.match(value):
+        return "#"
+    # Bare domains such as "linkedin.com/in/..."
+    return f"https://{value}" if value else "#"
+
+
+class RenderedPage:
+    """An HTML body with its precompressed copy and validator"""
+
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+    def __len__(self):
+        # Size as accounted for by TenantSnapshotCache.derive
+        return len(self.body) + len(self.gzipped)
+
+
+class PageRenderer:
+    def __init__(self, template_dir: Path = TEMPLATE_DIR, template_name: str = "portfolio.html"):
+        environment = Environment(
+            loader=FileSystemLoader(str(template_dir)),
+            autoescape=select_autoescape(["html"]),
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+        environment.filters["safe_url"] = safe_url
+        self.template = environment.get_template(template_name)
+
+    def render(self, portfolio: Dict[str, Any]) -> RenderedPage:
+        html = self.template.render(
+            personal=portfolio["personal"],
+            skills=portfolio.get("skills", []),
+            experience=portfolio.get("experience", []),
+            projects=portfolio.get("projects", []),
+        )
+        return RenderedPage(html.encode("utf-8"))
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
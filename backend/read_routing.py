@@ -0,0 +1,73 @@
+"""Per-operation read routing across replica set members.
+
+Each named read route gets its own database handle on the shared client,
+carrying the route's read preference and read concern:
+
+* ``portfolio`` - portfolio/skills/projects reads (``secondaryPreferred``)
+* ``analytics`` - rollups, stats and status listings (``secondaryPreferred``)
+* ``primary``   - admin views that must read their own writes (``primary``)
+
+Writes always go to the primary regardless of route.  Against a standalone
+server every route simply reads from that server.
+"""
+import os
+from typing import Dict, Mapping
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+READ_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+READ_CONCERN_LEVELS = {"local", "available", "majority", "linearizable", "snapshot"}
+
+ROUTE_DEFAULTS = {
+    "portfolio": ("secondaryPreferred", "local"),
+    "analytics": ("secondaryPreferred", "local"),
+    "primary": ("primary", "local"),
+}
+
+# MongoDB rejects maxStalenessSeconds below 90
+MIN_MAX_STALENESS_SECONDS = 90
+
+
+def build_read_preference(mode: str, max_staleness: int):
+    if mode not in READ_MODES:
+        raise ValueError(f"Unknown read preference '{mode}' (expected one of {', '.join(READ_MODES)})")
+    if mode == "primary":
+        return Primary()
+    if max_staleness != -1 and max_staleness < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError(f"Max staleness must be -1 or at least {MIN_MAX_STALENESS_SECONDS} seconds")
+    return READ_MODES[mode](max_staleness=max_staleness)
+
+
+def build_read_concern(level: str) -> ReadConcern:
+    if level not in READ_CONCERN_LEVELS:
+        raise ValueError(f"Unknown read concern '{level}' (expected one of {', '.join(sorted(READ_CONCERN_LEVELS))})")
+    return ReadConcern(level)
+
+
+def routed_databases(client, db_name: str, environ: Mapping[str, str] = os.environ) -> Dict[str, object]:
+    """Database handles per read route, configured from READ_PREFERENCE_<ROUTE>/READ_CONCERN_<ROUTE>"""
+    max_staleness = int(environ.get("MONGO_MAX_STALENESS_SECONDS", "90"))
+    databases = {}
+    for route, (default_mode, default_concern) in ROUTE_DEFAULTS.items():
+        mode = environ.get(f"READ_PREFERENCE_{route.upper()}", default_mode)
+        level = environ.get(f"READ_CONCERN_{route.upper()}", default_concern)
+        databases[route] = client.get_database(
+            db_name,
+            read_preference=build_read_preference(mode, max_staleness),
+            read_concern=build_read_concern(level),
+        )
+    return databases
+
+
+def describe(databases: Dict[str, object]) -> str:
+    return ", ".join(
+        f"{route}={db.read_preference.mongos_mode}/{db.read_concern.level or 'default'}"
+        for route, db in databases.items()
+    )
@@ -0,0 +1,166 @@
+"""Retention policies for the append-only collections.
+
+``status_checks`` expires through a TTL index.  Old ``contact_submissions``
+are moved by :class:`ContactArchiver` into gzip-compressed NDJSON chunk files
+named ``contacts-<first>-<last>-<id>.ndjson.gz`` (UTC timestamps), so range
+queries only need to open the chunks that overlap the requested window.
+Archived submissions exist only in those files, so the archive directory
+must be on persistent storage.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+CHUNK_PATTERN = re.compile(r'^contacts-(\d{8}T\d{6})-(\d{8}T\d{6})-[0-9a-f]+\.ndjson\.gz$')
+CHUNK_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+
+async def ensure_retention_indexes(db, status_ttl_days: int):
+    """Create the TTL index on status checks and the date index used by contact scans"""
+    expire_after = int(timedelta(days=status_ttl_days).total_seconds())
+    try:
+        await db.status_checks.create_index(
+            [("timestamp", ASCENDING)], name="status_checks_ttl", expireAfterSeconds=expire_after
+        )
+    except OperationFailure as e:
+        if e.code != 85:  # IndexOptionsConflict: the TTL changed since the index was built
+            raise
+        await db.command(
+            "collMod", "status_checks",
+            index={"name": "status_checks_ttl", "expireAfterSeconds": expire_after},
+        )
+    await db.contact_submissions.create_index([("submitted_at", DESCENDING)], name="submitted_at_desc")
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalise query datetimes to the naive UTC values Mongo stores"""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_record(doc: Dict[str, Any]) -> str:
+    record = {k: v.isoformat() if isinstance(v, datetime) else v for k, v in doc.items()}
+    return json.dumps(record, separators=(",", ":"))
+
+
+def decode_record(line: str) -> Dict[str, Any]:
+    record = json.loads(line)
+    if "submitted_at" in record:
+        record["submitted_at"] = datetime.fromisoformat(record["submitted_at"])
+    return record
+
+
+class ContactArchiver:
+    """Moves contact submissions older than the retention window into archive chunks"""
+
+    def __init__(self, db, archive_dir: Path, retention_days: int, chunk_size: int = 1000):
+        self.db = db
+        self.archive_dir = Path(archive_dir)
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+
+    def _write_chunk(self, docs: List[Dict[str, Any]]) -> Path:
+        first = docs[0]["submitted_at"].strftime(CHUNK_TIME_FORMAT)
+        last = docs[-1]["submitted_at"].strftime(CHUNK_TIME_FORMAT)
+        path = self.archive_dir / f"contacts-{first}-{last}-{uuid.uuid4().hex[:12]}.ndjson.gz"
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as raw:
+            with gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as f:
+                for doc in docs:
+                    f.write(encode_record(doc))
+                    f.write("\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        # Persist the rename itself, not just the file contents
+        dir_fd = os.open(self.archive_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        return path
+
+    async def archive_once(self, now: Optional[datetime] = None) -> int:
+        """Archive every expired submission; returns the number of documents moved"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        archived = 0
+
+        while True:
+            docs = await self.db.contact_submissions.find(
+                {"submitted_at": {"$lt": cutoff}}, {"_id": 0}
+            ).sort("submitted_at", ASCENDING).limit(self.chunk_size).to_list(self.chunk_size)
+            if not docs:
+                break
+
+            # The chunk is fsynced (file and directory) before the hot copies are removed
+            path = await asyncio.to_thread(self._write_chunk, docs)
+            await self.db.contact_submissions.delete_many({"id": {"$in": [d["id"] for d in docs]}})
+            archived += len(docs)
+            logger.info(f"Archived {len(docs)} contact submissions to {path.name}")
+
+            if len(docs) < self.chunk_size:
+                break
+
+        return archived
+
+    async def run_forever(self, interval_seconds: int):
+        """Archive on a fixed interval until cancelled"""
+        while True:
+            try:
+                await self.archive_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Contact archival failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    def chunks_between(self, since: Optional[datetime], until: Optional[datetime]) -> List[Path]:
+        """Archive chunks whose time span overlaps [since, until], oldest first"""
+        if not self.archive_dir.exists():
+            return []
+
+        chunks = []
+        for path in self.archive_dir.iterdir():
+            match = CHUNK_PATTERN.match(path.name)
+            if not match:
+                continue
+            first = datetime.strptime(match.group(1), CHUNK_TIME_FORMAT)
+            # Chunk names are truncated to the second
+            last = datetime.strptime(match.group(2), CHUNK_TIME_FORMAT) + timedelta(seconds=1)
+            if (since and last < since) or (until and first > until):
+                continue
+            chunks.append((first, path))
+        return [path for _, path in sorted(chunks)]
+
+    @staticmethod
+    def read_chunk(path: Path, since: Optional[datetime], until: Optional[datetime],
+                   tenant: Optional[str] = None, default_tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        records = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = decode_record(line)
+                # Records archived before tenancy existed belong to the default tenant
+                if tenant and record.get("tenant", default_tenant) != tenant:
+                    continue
+                submitted_at = record.get("submitted_at")
+                if since and submitted_at < since:
+                    continue
+                if until and submitted_at > until:
+                    continue
+                records.append(record)
+        return records
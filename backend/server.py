@@ -1,18 +1,35 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Request, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import re
+import asyncio
+import secrets
+
+from access_log import AccessLogMiddleware, DbTimingListener, setup_logging
+from edge import EdgeMiddleware
+from encoding import EncodedResponse, negotiate, render
+from heartbeats import BUCKET_MINUTES, HeartbeatAggregator, ensure_heartbeat_indexes, query_rollups
+from media import MediaStore, FIELD_WIDTHS, HASH_PATTERN, negotiate_image_type, portfolio_image_sources
+import analytics
+from prerender import PageRenderer, accepts_gzip, etag_matches
+from read_routing import describe as describe_read_routes, routed_databases
+from retention import ContactArchiver, encode_record, ensure_retention_indexes, to_naive_utc
+from seed_data import DEFAULT_PORTFOLIO_DATA
+from spam import SpamClassifier
+from tenancy import (
+    DEFAULT_TENANT, PORTFOLIO_PROJECTION, TENANT_HEADER, TenantDirectory, TenantSnapshot,
+    TenantSnapshotCache, ensure_tenant_indexes, is_valid_slug, normalize_host,
+)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -22,10 +39,79 @@ load_dotenv(ROOT_DIR / '.env')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'development')
 IS_PRODUCTION = ENVIRONMENT == 'production'
 
+# Configure logging (queue-backed; a listener thread does the I/O)
+log_listener = setup_logging(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    queue_size=int(os.environ.get('LOG_QUEUE_SIZE', '10000')),
+)
+logger = logging.getLogger(__name__)
+# Fraction of successful requests written to the access log; errors are always logged
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', '0.1' if IS_PRODUCTION else '1.0'))
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[DbTimingListener()])
 db = client[os.environ['DB_NAME']]
+# Read routing: portfolio/analytics reads may go to secondaries, admin views stay on the primary
+read_dbs = routed_databases(client, os.environ['DB_NAME'])
+portfolio_db = read_dbs['portfolio']
+analytics_db = read_dbs['analytics']
+primary_db = read_dbs['primary']
+
+# Local image cache (content-addressed originals + resized variants)
+media_store = MediaStore(
+    root=Path(os.environ.get('MEDIA_ROOT', ROOT_DIR / 'media_cache')),
+    widths=[int(w) for w in os.environ.get('MEDIA_WIDTHS', '100,200,400,800').split(',')],
+    max_workers=int(os.environ.get('MEDIA_WORKERS', '2')),
+    # Only these hosts (and local files under the fixture directory) are fetched for ingestion
+    allowed_hosts=os.environ.get('MEDIA_ALLOWED_HOSTS', 'images.unsplash.com').split(','),
+    fixture_dir=Path(os.environ.get('MEDIA_FIXTURE_DIR', ROOT_DIR / 'fixtures' / 'images')),
+)
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Public origin of this API, used for rewritten image URLs (defaults to the request's base URL)
+MEDIA_PUBLIC_URL = os.environ.get('MEDIA_PUBLIC_URL')
+
+# Retention policies for the growing collections
+STATUS_CHECK_TTL_DAYS = int(os.environ.get('STATUS_CHECK_TTL_DAYS', '30'))
+# Archival deletes the hot copies, so it only runs with an explicitly configured
+# (persistent) archive directory
+CONTACT_ARCHIVE_DIR = os.environ.get('CONTACT_ARCHIVE_DIR')
+contact_archiver = ContactArchiver(
+    db,
+    archive_dir=Path(CONTACT_ARCHIVE_DIR),
+    retention_days=int(os.environ.get('CONTACT_RETENTION_DAYS', '180')),
+    chunk_size=int(os.environ.get('CONTACT_ARCHIVE_CHUNK_SIZE', '1000')),
+) if CONTACT_ARCHIVE_DIR else None
+CONTACT_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('CONTACT_ARCHIVE_INTERVAL_SECONDS', '3600'))
+background_tasks: List[asyncio.Task] = []
+
+# Legacy status heartbeats are counted in memory and flushed as rollups
+heartbeat_aggregator = HeartbeatAggregator(db)
+HEARTBEAT_FLUSH_SECONDS = float(os.environ.get('HEARTBEAT_FLUSH_SECONDS', '10'))
+# Also keep one raw status_checks document per heartbeat (pre-rollup behaviour)
+STATUS_STORE_RAW = os.environ.get('STATUS_STORE_RAW', 'false').lower() == 'true'
+
+# Multi-tenant portfolio serving
+TENANT_CACHE_MAX_BYTES = int(os.environ.get('TENANT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+TENANT_CACHE_TTL_SECONDS = float(os.environ.get('TENANT_CACHE_TTL_SECONDS', '300'))
+# Unknown tenants are remembered briefly so repeated lookups do not reach MongoDB
+TENANT_CACHE_MISS_TTL_SECONDS = float(os.environ.get('TENANT_CACHE_MISS_TTL_SECONDS', '30'))
+tenant_directory = TenantDirectory()
+# Bearer token for tenant administration; when unset, tenant writes are refused
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Replacing the default portfolio through the tenant API must be switched on explicitly
+ADMIN_ALLOW_DEFAULT_TENANT_WRITES = os.environ.get('ADMIN_ALLOW_DEFAULT_TENANT_WRITES', 'false').lower() == 'true'
+
+# Server-rendered HTML snapshot of the portfolio (rendered once per snapshot)
+page_renderer = PageRenderer()
+SNAPSHOT_CACHE_CONTROL = "public, no-cache"
+
+# Spam scoring of contact submissions (naive Bayes trained from admin labels)
+spam_classifier = SpamClassifier(
+    db,
+    threshold=float(os.environ.get('SPAM_THRESHOLD', '0.9')),
+    chunk_size=int(os.environ.get('SPAM_RESCORE_CHUNK_SIZE', '1000')),
+)
 
 # Create the main app
 app = FastAPI(
@@ -36,15 +122,6 @@ app = FastAPI(
     redoc_url="/redoc" if not IS_PRODUCTION else None  # Disable redoc in production
 )
 
-# Production middlewares
-if IS_PRODUCTION:
-    app.add_middleware(
-        TrustedHostMiddleware, 
-        allowed_hosts=["*.onrender.com", "*.vercel.app", "*.netlify.app"]
-    )
-
-app.add_middleware(GZipMiddleware, minimum_size=1000)
-
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -116,6 +193,9 @@ class PortfolioData(BaseModel):
     testimonials: List[Testimonial]
     stats: List[Stat]
 
+class TenantPortfolio(PortfolioData):
+    hosts: List[str] = Field(default_factory=list)
+
 # Contact Form Models
 class ContactSubmission(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -124,6 +204,9 @@ class ContactSubmission(BaseModel):
     message: str = Field(..., min_length=10, max_length=1000)
     submitted_at: datetime = Field(default_factory=datetime.utcnow)
     status: str = Field(default="new")
+    tenant: str = Field(default=DEFAULT_TENANT)
+    spam_score: Optional[float] = None
+    spam_label: Optional[bool] = None
 
 class ContactSubmissionCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=100)
@@ -135,6 +218,39 @@ class ContactResponse(BaseModel):
     message: str
     id: Optional[str] = None
 
+class SpamLabel(BaseModel):
+    spam: bool
+
+class SpamModelStatus(BaseModel):
+    trained: bool
+    threshold: float
+    trained_at: Optional[datetime] = None
+    n_spam: Optional[int] = None
+    n_ham: Optional[int] = None
+    rescored: Optional[int] = None
+
+# Contact Analytics Models
+class DailyCount(BaseModel):
+    date: str
+    count: int
+
+class WeeklyCount(BaseModel):
+    week_start: str
+    count: int
+
+class DomainCount(BaseModel):
+    domain: str
+    count: int
+
+class ContactStats(BaseModel):
+    since: str
+    until: str
+    total: int
+    per_day: List[DailyCount]
+    per_week: List[WeeklyCount]
+    by_status: Dict[str, int]
+    top_domains: List[DomainCount]
+
 # Legacy Models (keeping for compatibility)
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -144,6 +260,26 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class StatusRollupPoint(BaseModel):
+    bucket: datetime
+    count: int
+    uptime: float
+    last_seen: datetime
+
+class StatusClientRollup(BaseModel):
+    client_name: str
+    last_seen: datetime
+    total: int
+    uptime: float
+    series: List[StatusRollupPoint]
+
+class StatusRollups(BaseModel):
+    granularity: str
+    since: datetime
+    until: datetime
+    truncated: bool
+    clients: List[StatusClientRollup]
+
 # Helper Functions
 def validate_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -155,6 +291,60 @@ def sanitize_input(text: str) -> str:
     text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
     return text.strip()
 
+def media_base_url(request: Request) -> str:
+    return MEDIA_PUBLIC_URL or str(request.base_url)
+
+async def current_tenant(request: Request) -> str:
+    """Resolve the tenant slug from the tenant header/query parameter or the Host header"""
+    tenant = tenant_directory.resolve(
+        request.headers.get(TENANT_HEADER) or request.query_params.get("tenant"),
+        request.headers.get("host"),
+    )
+    if not is_valid_slug(tenant):
+        raise HTTPException(status_code=400, detail="Invalid tenant")
+    return tenant
+
+async def require_admin(authorization: Optional[str] = Header(default=None)):
+    """Check the ``Authorization: Bearer <ADMIN_TOKEN>`` header of an admin request"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Tenant administration is disabled (ADMIN_TOKEN not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin credentials", headers={"WWW-Authenticate": "Bearer"})
+
+async def load_portfolio(tenant: str) -> Optional[Dict[str, Any]]:
+    portfolio_doc = await portfolio_db.portfolio_data.find_one({"tenant": tenant}, PORTFOLIO_PROJECTION)
+    if not portfolio_doc:
+        # A lagging secondary may not have the document yet; confirm on the primary
+        portfolio_doc = await primary_db.portfolio_data.find_one({"tenant": tenant}, PORTFOLIO_PROJECTION)
+    if not portfolio_doc and tenant == DEFAULT_TENANT:
+        # If no portfolio data exists, seed it with default data
+        portfolio_doc = await seed_portfolio_data()
+    return portfolio_doc
+
+tenant_cache = TenantSnapshotCache(
+    load_portfolio, TENANT_CACHE_MAX_BYTES, TENANT_CACHE_TTL_SECONDS, TENANT_CACHE_MISS_TTL_SECONDS
+)
+
+async def get_snapshot(tenant: str) -> TenantSnapshot:
+    snapshot = await tenant_cache.get(tenant)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    return snapshot
+
+def encoded_response(request: Request, content: Any) -> EncodedResponse:
+    """Encode a payload as JSON, MessagePack or CBOR according to the Accept header"""
+    media_type = negotiate(request.headers.get("accept"))
+    return EncodedResponse(render(jsonable_encoder(content), media_type), media_type)
+
+def cached_response(request: Request, snapshot: TenantSnapshot, key: str, build) -> EncodedResponse:
+    """Like encoded_response, but reuses the body cached on the tenant snapshot"""
+    media_type = negotiate(request.headers.get("accept"))
+    body = tenant_cache.derive(
+        snapshot, f"{key}:{media_type}", lambda: render(jsonable_encoder(build()), media_type)
+    )
+    return EncodedResponse(body, media_type)
+
 # API Routes
 
 # Root endpoint
@@ -164,50 +354,108 @@ async def root():
 
 # Portfolio Data Endpoints
 @api_router.get("/portfolio", response_model=Dict[str, Any])
-async def get_portfolio_data():
+async def get_portfolio_data(request: Request, tenant: str = Depends(current_tenant)):
     """Get complete portfolio data"""
     try:
-        portfolio_doc = await db.portfolio_data.find_one({}, {"_id": 0})
-        
-        if not portfolio_doc:
-            # If no portfolio data exists, seed it with default data
-            await seed_portfolio_data()
-            portfolio_doc = await db.portfolio_data.find_one({}, {"_id": 0})
-        
-        return portfolio_doc
+        snapshot = await get_snapshot(tenant)
+        base_url = media_base_url(request)
+        return cached_response(
+            request, snapshot, f"portfolio:{base_url}",
+            lambda: media_store.rewrite_portfolio(snapshot.data, base_url),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching portfolio data: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch portfolio data")
 
+@api_router.get("/portfolio/snapshot.html", response_class=Response)
+async def get_portfolio_snapshot(request: Request, tenant: str = Depends(current_tenant)):
+    """Static HTML rendering of the portfolio, served precompressed with an ETag"""
+    try:
+        snapshot = await get_snapshot(tenant)
+        base_url = media_base_url(request)
+        page = tenant_cache.derive(
+            snapshot, f"html:{base_url}",
+            lambda: page_renderer.render(media_store.rewrite_portfolio(snapshot.data, base_url)),
+        )
+        headers = {"ETag": page.etag, "Cache-Control": SNAPSHOT_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), page.etag):
+            return Response(status_code=304, headers=headers)
+        if accepts_gzip(request.headers.get("accept-encoding")):
+            headers["Content-Encoding"] = "gzip"
+            return Response(page.gzipped, media_type="text/html; charset=utf-8", headers=headers)
+        return Response(page.body, media_type="text/html; charset=utf-8", headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering portfolio snapshot: {e}")
+        raise HTTPException(status_code=500, detail="Failed to render portfolio snapshot")
+
 @api_router.get("/portfolio/skills", response_model=List[Skill])
-async def get_skills():
+async def get_skills(request: Request, tenant: str = Depends(current_tenant)):
     """Get skills data"""
     try:
-        portfolio_doc = await db.portfolio_data.find_one({}, {"_id": 0, "skills": 1})
-        if portfolio_doc and "skills" in portfolio_doc:
-            return portfolio_doc["skills"]
-        return []
+        snapshot = await get_snapshot(tenant)
+        return cached_response(request, snapshot, "skills", lambda: snapshot.data.get("skills", []))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching skills: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch skills data")
 
 @api_router.get("/portfolio/projects", response_model=List[Project])
-async def get_projects():
+async def get_projects(request: Request, tenant: str = Depends(current_tenant)):
     """Get projects data"""
     try:
-        portfolio_doc = await db.portfolio_data.find_one({}, {"_id": 0, "projects": 1})
-        if portfolio_doc and "projects" in portfolio_doc:
-            return portfolio_doc["projects"]
-        return []
+        snapshot = await get_snapshot(tenant)
+        base_url = media_base_url(request)
+        return cached_response(
+            request, snapshot, f"projects:{base_url}",
+            lambda: media_store.rewrite_items(
+                snapshot.data.get("projects", []), "image", FIELD_WIDTHS["projects"], base_url
+            ),
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching projects: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch projects data")
 
+# Media Endpoint (locally cached portfolio images)
+@api_router.get("/media/{digest}/{width}")
+async def get_media(digest: str, width: int, accept: Optional[str] = Header(default=None)):
+    """Serve a resized variant of an ingested image"""
+    if not HASH_PATTERN.match(digest) or width not in media_store.widths:
+        raise HTTPException(status_code=404, detail="Image not found")
+    if not media_store.has_original(digest):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    media_type = negotiate_image_type(accept)
+    try:
+        path = await media_store.ensure_variant(digest, width, media_type)
+    except Exception as e:
+        logger.error(f"Error rendering image {digest}/{width}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to render image")
+
+    return FileResponse(
+        path,
+        media_type=media_type,
+        headers={
+            "Cache-Control": MEDIA_CACHE_CONTROL,
+            "ETag": f'"{digest}-{width}-{path.suffix[1:]}"',
+            "Vary": "Accept",
+        },
+    )
+
 # Contact Form Endpoint
 @api_router.post("/contact", response_model=ContactResponse)
-async def submit_contact_form(contact_data: ContactSubmissionCreate):
+async def submit_contact_form(contact_data: ContactSubmissionCreate, tenant: str = Depends(current_tenant)):
     """Handle contact form submissions"""
     try:
+        # Only accept messages for portfolios we actually serve
+        await get_snapshot(tenant)
+        
         # Sanitize input
         sanitized_data = {
             "name": sanitize_input(contact_data.name),
@@ -225,13 +473,25 @@ async def submit_contact_form(contact_data: ContactSubmissionCreate):
         if len(sanitized_data["message"]) < 10:
             raise HTTPException(status_code=400, detail="Message must be at least 10 characters")
         
+        try:
+            spam_score = spam_classifier.score(sanitized_data)
+        except Exception as e:
+            # A scoring failure must never cost us a submission
+            logger.error(f"Error scoring contact submission: {e}")
+            spam_score = None
+        
         # Create contact submission
-        contact_submission = ContactSubmission(**sanitized_data)
+        contact_submission = ContactSubmission(**sanitized_data, tenant=tenant, spam_score=spam_score)
         
         # Store in database
         result = await db.contact_submissions.insert_one(contact_submission.dict())
         
         if result.inserted_id:
+            try:
+                await analytics.record_contact(db, contact_submission.dict())
+            except Exception as e:
+                # Analytics must never cost us a submission
+                logger.error(f"Error updating contact rollups: {e}")
             return ContactResponse(
                 success=True,
                 message="Thanks for reaching out! I'll get back to you soon.",
@@ -248,205 +508,336 @@ async def submit_contact_form(contact_data: ContactSubmissionCreate):
 
 # Admin Endpoints (for viewing contact submissions)
 @api_router.get("/admin/contacts", response_model=List[ContactSubmission])
-async def get_contact_submissions():
-    """Get all contact submissions (admin only)"""
+async def get_contact_submissions(
+    request: Request,
+    spam: Optional[bool] = None,
+    tenant: str = Depends(current_tenant),
+):
+    """Get all contact submissions (admin only), optionally only spam or only non-spam"""
     try:
-        contacts = await db.contact_submissions.find({}, {"_id": 0}).sort("submitted_at", -1).to_list(100)
-        return [ContactSubmission(**contact) for contact in contacts]
+        query = {"tenant": tenant}
+        if spam is not None:
+            query.update(spam_classifier.listing_filter(spam))
+        contacts = await primary_db.contact_submissions.find(query, {"_id": 0}).sort("submitted_at", -1).to_list(100)
+        return encoded_response(request, [ContactSubmission(**contact) for contact in contacts])
     except Exception as e:
         logger.error(f"Error fetching contacts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch contact submissions")
 
+@api_router.get("/admin/contacts/stats", response_model=ContactStats)
+async def get_contact_stats(
+    request: Request,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    top: int = 10,
+    tenant: str = Depends(current_tenant),
+):
+    """Contact submission stats from the daily rollups (default: last 30 days)"""
+    since, until = analytics.default_range(since, until)
+    if since > until:
+        raise HTTPException(status_code=400, detail="'since' must not be after 'until'")
+    try:
+        rollups = await analytics.fetch_rollups(analytics_db, tenant, since, until)
+        return encoded_response(request, analytics.compute_stats(rollups, since, until, top=max(1, min(top, 100))))
+    except Exception as e:
+        logger.error(f"Error computing contact stats: {e}")
+        raise HTTPException(status_code=500, detail="Failed to compute contact stats")
+
+@api_router.get("/admin/contacts/export")
+async def export_contact_submissions(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: bool = True,
+    tenant: str = Depends(current_tenant),
+):
+    """Stream contact submissions (archived chunks, then the hot collection) as NDJSON"""
+    since, until = to_naive_utc(since), to_naive_utc(until)
+    query: Dict[str, Any] = {"tenant": tenant}
+    if since or until:
+        query["submitted_at"] = {}
+        if since:
+            query["submitted_at"]["$gte"] = since
+        if until:
+            query["submitted_at"]["$lte"] = until
+
+    async def generate():
+        if include_archived and contact_archiver is not None:
+            for chunk in contact_archiver.chunks_between(since, until):
+                records = await asyncio.to_thread(
+                    contact_archiver.read_chunk, chunk, since, until, tenant, DEFAULT_TENANT
+                )
+                yield "".join(encode_record(record) + "\n" for record in records)
+
+        cursor = primary_db.contact_submissions.find(query, {"_id": 0}).sort("submitted_at", 1)
+        async for contact in cursor:
+            yield encode_record(contact) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@api_router.post("/admin/contacts/{contact_id}/label", response_model=ContactResponse)
+async def label_contact_submission(contact_id: str, label: SpamLabel, tenant: str = Depends(current_tenant)):
+    """Mark a contact submission as spam or not spam (training data for the spam model)"""
+    try:
+        contact = await primary_db.contact_submissions.find_one(
+            {"id": contact_id, "tenant": tenant}, {"_id": 0, "id": 1, "name": 1, "email": 1, "message": 1}
+        )
+        if not contact:
+            raise HTTPException(status_code=404, detail="Contact submission not found")
+        await db.contact_submissions.update_one({"id": contact_id}, {"$set": {"spam_label": label.spam}})
+        await spam_classifier.label(contact, label.spam)
+        return ContactResponse(
+            success=True, message=f"Submission labelled as {'spam' if label.spam else 'not spam'}", id=contact_id
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error labelling contact {contact_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to label contact submission")
+
+@api_router.get("/admin/spam", response_model=SpamModelStatus)
+async def get_spam_model():
+    """Current spam model and threshold"""
+    return spam_classifier.status()
+
+@api_router.post("/admin/spam/train", response_model=SpamModelStatus)
+async def train_spam_model(rescore: bool = True):
+    """Train the spam model from all labelled submissions, then re-score stored submissions"""
+    try:
+        await spam_classifier.train()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error training spam model: {e}")
+        raise HTTPException(status_code=500, detail="Failed to train spam model")
+    return await rescore_contact_submissions() if rescore else spam_classifier.status()
+
+@api_router.post("/admin/spam/rescore", response_model=SpamModelStatus)
+async def rescore_contact_submissions():
+    """Re-score all stored contact submissions with the current spam model"""
+    if spam_classifier.model is None:
+        raise HTTPException(status_code=400, detail="No spam model has been trained yet")
+    try:
+        rescored = await spam_classifier.rescore()
+        return {**spam_classifier.status(), "rescored": rescored}
+    except Exception as e:
+        logger.error(f"Error re-scoring contact submissions: {e}")
+        raise HTTPException(status_code=500, detail="Failed to re-score contact submissions")
+
 # Admin endpoint to refresh portfolio data
 @api_router.post("/admin/refresh-portfolio")
 async def refresh_portfolio_data():
-    """Refresh portfolio data - Force reseed"""
+    """Refresh portfolio data - Force reseed of the default portfolio"""
     try:
-        await seed_portfolio_data()
+        portfolio_doc = await seed_portfolio_data()
+        # Serve the written document right away rather than reloading it from a secondary
+        tenant_cache.put(DEFAULT_TENANT, portfolio_doc)
+        schedule_image_ingest(DEFAULT_TENANT)
         return {"success": True, "message": "Portfolio data refreshed successfully"}
     except Exception as e:
         logger.error(f"Error refreshing portfolio data: {e}")
         raise HTTPException(status_code=500, detail="Failed to refresh portfolio data")
 
+# Admin endpoint to create or replace a tenant's portfolio
+@api_router.put("/admin/tenants/{slug}/portfolio", dependencies=[Depends(require_admin)])
+async def put_tenant_portfolio(slug: str, portfolio: TenantPortfolio):
+    """Create or replace the portfolio served for a tenant"""
+    if not is_valid_slug(slug):
+        raise HTTPException(status_code=400, detail="Invalid tenant slug")
+    if slug == DEFAULT_TENANT and not ADMIN_ALLOW_DEFAULT_TENANT_WRITES:
+        raise HTTPException(status_code=403, detail="Writes to the default portfolio are disabled")
+    try:
+        hosts = sorted({normalize_host(host) for host in portfolio.hosts if host.strip()})
+        if hosts:
+            conflict = await db.portfolio_data.find_one(
+                {"hosts": {"$in": hosts}, "tenant": {"$ne": slug}}, {"_id": 0, "tenant": 1}
+            )
+            if conflict:
+                raise HTTPException(status_code=409, detail=f"Host already assigned to tenant '{conflict['tenant']}'")
+        
+        portfolio_data = portfolio.dict(exclude={"hosts"})
+        await db.portfolio_data.replace_one(
+            {"tenant": slug}, {**portfolio_data, "tenant": slug, "hosts": hosts}, upsert=True
+        )
+        tenant_cache.put(slug, portfolio_data)
+        await tenant_directory.reload(db)
+        schedule_image_ingest(slug)
+        return {"success": True, "message": f"Portfolio for '{slug}' saved successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error saving portfolio for tenant {slug}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save portfolio data")
+
 # Legacy endpoints (keeping for compatibility)
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    heartbeat_aggregator.record(status_obj.client_name, status_obj.timestamp)
+    if STATUS_STORE_RAW:
+        _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+async def get_status_checks(request: Request):
+    if not STATUS_STORE_RAW:
+        # Heartbeats are only kept as rollups, so there is no list to return
+        raise HTTPException(
+            status_code=410, detail="Individual status checks are not stored; use /api/status/rollups"
+        )
+    status_checks = await analytics_db.status_checks.find().to_list(1000)
+    return encoded_response(request, [StatusCheck(**status_check) for status_check in status_checks])
+
+@api_router.get("/status/rollups", response_model=StatusRollups)
+async def get_status_rollups(
+    request: Request,
+    granularity: str = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+):
+    """Last-seen times and per-client heartbeat/uptime series (default: last 24 hours)"""
+    if granularity not in BUCKET_MINUTES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(BUCKET_MINUTES)}")
+    until = to_naive_utc(until) or datetime.utcnow()
+    since = to_naive_utc(since) or until - timedelta(days=1)
+    if since > until:
+        raise HTTPException(status_code=400, detail="'since' must not be after 'until'")
+    try:
+        rollups = await query_rollups(analytics_db, granularity, since, until, client_name)
+        return encoded_response(request, rollups)
+    except Exception as e:
+        logger.error(f"Error fetching status rollups: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch status rollups")
 
 # Seed Portfolio Data Function
-async def seed_portfolio_data():
-    """Seed initial portfolio data to MongoDB"""
-    portfolio_data = {
-        "personal": {
-            "name": "Risheek N",
-            "title": "AI-Powered Backend Developer",
-            "subtitle": "REST API Specialist",
-            "email": "risheek2627@gmail.com",
-            "phone": "9901737965",
-            "linkedin": "linkedin.com/in/risheek-n",
-            "bio": "Hey! I'm Risheek, a backend developer passionate about building scalable REST APIs and AI-powered applications. I merge backend logic with intelligent systems to create real-world impact."
-        },
-        "skills": [
-            {"name": "JavaScript", "level": 85, "icon": "js", "category": "language"},
-            {"name": "Python", "level": 90, "icon": "python", "category": "language"},
-            {"name": "Node.js", "level": 85, "icon": "nodejs", "category": "runtime"},
-            {"name": "Express.js", "level": 88, "icon": "server", "category": "framework"},
-            {"name": "MySQL", "level": 82, "icon": "database", "category": "database"},
-            {"name": "MongoDB", "level": 85, "icon": "mongodb", "category": "database"},
-            {"name": "REST APIs", "level": 90, "icon": "api", "category": "backend"},
-            {"name": "Git", "level": 88, "icon": "git", "category": "tools"},
-            {"name": "GitHub", "level": 85, "icon": "github", "category": "tools"}
-        ],
-        "experience": [
-            {
-                "id": 1,
-                "position": "Backend Developer",
-                "company": "Ants Applied Data Science",
-                "duration": "Aug 2024 – Feb 2025",
-                "type": "Current",
-                "achievements": [
-                    "JWT-auth APIs with 35% fewer bugs",
-                    "MySQL integration for optimized backend",
-                    "Scalable architecture for Solar DL project",
-                    "Built robust REST API endpoints"
-                ],
-                "technologies": ["Node.js", "Express.js", "MySQL", "JWT", "REST APIs"]
-            },
-            {
-                "id": 2,
-                "position": "AI/ML Intern",
-                "company": "Ants Applied Data Science",
-                "duration": "Jan 2024 – Apr 2024",
-                "type": "Internship",
-                "achievements": [
-                    "ML models for prediction (+25% accuracy)",
-                    "Used Python for data analysis and modeling",
-                    "Implemented machine learning algorithms",
-                    "Data preprocessing and feature engineering"
-                ],
-                "technologies": ["Python", "Scikit-learn", "Pandas", "NumPy", "ML"]
-            }
-        ],
-        "projects": [
-            {
-                "id": 1,
-                "title": "Movie Recommendation System",
-                "description": "An intelligent movie recommendation platform using collaborative and content-based filtering algorithms to provide personalized movie suggestions.",
-                "technologies": ["Python", "Streamlit", "TMDB API", "Pandas", "Scikit-learn"],
-                "features": [
-                    "Collaborative filtering algorithm",
-                    "Content-based recommendations",
-                    "Real-time TMDB API integration",
-                    "Interactive Streamlit interface",
-                    "User preference learning"
-                ],
-                "liveUrl": "#",
-                "codeUrl": "#",
-                "image": "https://images.unsplash.com/photo-1489875347897-49f64b51c1f8?w=400&q=80",
-                "status": "Completed",
-                "category": "AI/ML"
-            }
-        ],
-        "education": [
-            {
-                "id": 1,
-                "degree": "Diploma in Computer Science",
-                "institution": "Sri Jayachamarajendra Polytechnic",
-                "duration": "2021 – 2024",
-                "type": "Diploma",
-                "status": "Completed"
-            },
-            {
-                "id": 2,
-                "degree": "SSLC",
-                "institution": "SMS Public School",
-                "duration": "2018 – 2021",
-                "type": "Secondary",
-                "status": "Completed"
-            }
-        ],
-        "testimonials": [
-            {
-                "id": 1,
-                "name": "Tech Mentor",
-                "role": "Senior Developer",
-                "company": "Tech Corp",
-                "message": "Risheek demonstrates exceptional backend development skills and shows great potential in AI integration.",
-                "avatar": "https://images.unsplash.com/photo-1472099645785-5658abf4ff4e?w=100&q=80"
-            }
-        ],
-        "stats": [
-            {"label": "API Endpoints Built", "value": "50+", "icon": "server"},
-            {"label": "Bug Reduction", "value": "35%", "icon": "shield"},
-            {"label": "Accuracy Improvement", "value": "25%", "icon": "target"}
-        ]
-    }
-    
+async def seed_portfolio_data() -> Dict[str, Any]:
+    """Seed the default tenant's portfolio data to MongoDB and return the stored document"""
     # Insert or update portfolio data
-    await db.portfolio_data.replace_one({}, portfolio_data, upsert=True)
+    portfolio_doc = await db.portfolio_data.find_one_and_update(
+        {"tenant": DEFAULT_TENANT}, {"$set": DEFAULT_PORTFOLIO_DATA}, PORTFOLIO_PROJECTION,
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
     logger.info("Portfolio data seeded successfully")
+    return portfolio_doc
+
+async def ingest_portfolio_images(tenant: Optional[str] = None):
+    """Pull portfolio images (of one tenant, or all tenants) into the local media store"""
+    query = {"tenant": tenant} if tenant else {}
+    sources: List[str] = []
+    # Runs right after admin writes, so read from the primary
+    async for portfolio_doc in db.portfolio_data.find(query, {"_id": 0, "projects": 1, "testimonials": 1}):
+        sources.extend(portfolio_image_sources(portfolio_doc))
+    if not sources:
+        return
+    ingested = await media_store.ingest_many(dict.fromkeys(sources))
+    logger.info(f"Ingested {len(ingested)} portfolio images into the media store")
+    
+    # Cached responses still carry the original image URLs; the snapshots themselves are unchanged
+    tenant_cache.clear_derived(tenant)
+
+def schedule_image_ingest(tenant: Optional[str] = None):
+    """Run image ingestion in the background so requests never wait on remote origins"""
+    task = asyncio.create_task(ingest_portfolio_images(tenant))
+    task.add_done_callback(
+        lambda t: t.cancelled() or t.exception() is None or logger.error(f"Image ingestion failed: {t.exception()}")
+    )
+    return task
 
 # Include the router in the main app
 app.include_router(api_router)
 
-# CORS Configuration
+# Host checking, CORS and compression in one pure-ASGI middleware
 if IS_PRODUCTION:
-    # Production CORS - Specific origins
+    # Production - trusted hosts and specific CORS origins
+    allowed_hosts = [
+        host.strip()
+        for host in os.environ.get('ALLOWED_HOSTS', '*.onrender.com,*.vercel.app,*.netlify.app').split(',')
+        if host.strip()
+    ]
     allowed_origins = [
         "https://risheek-portfolio.vercel.app",  # Replace with your actual Vercel domain
         "https://*.vercel.app",
         "https://*.netlify.app",
     ]
     app.add_middleware(
-        CORSMiddleware,
+        EdgeMiddleware,
+        allowed_hosts=allowed_hosts,
+        # Custom domains registered for tenants are accepted as well, but only
+        # when registering them requires the admin token
+        host_validator=tenant_directory.knows_host if ADMIN_TOKEN else None,
         allow_origins=allowed_origins,
         allow_credentials=True,
         allow_methods=["GET", "POST"],
         allow_headers=["*"],
+        minimum_size=1000,
     )
 else:
-    # Development CORS - Allow all
+    # Development - any host, CORS allows all
     app.add_middleware(
-        CORSMiddleware,
+        EdgeMiddleware,
         allow_credentials=True,
         allow_origins=["*"],
         allow_methods=["*"],
         allow_headers=["*"],
+        minimum_size=1000,
     )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Access log (outermost, so its latency covers every other middleware)
+app.add_middleware(
+    AccessLogMiddleware,
+    sample_rate=ACCESS_LOG_SAMPLE_RATE,
+    slow_ms=float(os.environ.get('ACCESS_LOG_SLOW_MS', '1000')),
 )
-logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_db_client():
     """Initialize database on startup"""
+    media_store.open()
+    background_tasks.append(asyncio.create_task(
+        heartbeat_aggregator.run_forever(HEARTBEAT_FLUSH_SECONDS)
+    ))
     try:
         # Test database connection
         await client.admin.command('ping')
         logger.info("Successfully connected to MongoDB")
+        logger.info(f"Read routing: {describe_read_routes(read_dbs)}")
+        
+        await ensure_tenant_indexes(db)
+        await tenant_directory.reload(db)
         
         # Seed portfolio data if not exists
-        portfolio_exists = await db.portfolio_data.find_one({})
+        portfolio_exists = await db.portfolio_data.find_one({"tenant": DEFAULT_TENANT})
         if not portfolio_exists:
             await seed_portfolio_data()
             logger.info("Portfolio data seeded on startup")
+        
+        await ensure_retention_indexes(db, STATUS_CHECK_TTL_DAYS)
+        await analytics.ensure_rollup_indexes(db)
+        await ensure_heartbeat_indexes(db)
+        await analytics.backfill_rollups(db, contact_archiver, DEFAULT_TENANT)
+        await spam_classifier.load()
+        
+        # Warm the local image cache without delaying startup
+        schedule_image_ingest()
             
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
+    
+    # Started after the rollup backfill, which reads both the hot collection and the archive
+    if contact_archiver is not None:
+        background_tasks.append(asyncio.create_task(
+            contact_archiver.run_forever(CONTACT_ARCHIVE_INTERVAL_SECONDS)
+        ))
+    else:
+        logger.info("Contact archival disabled (CONTACT_ARCHIVE_DIR not set)")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    media_store.close()
     client.close()
     logger.info("Disconnected from MongoDB")
+    log_listener.stop()
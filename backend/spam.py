@@ -0,0 +1,190 @@
+"""In-process spam scoring for contact submissions.
+
+Submissions are turned into hashed word unigram/bigram counts (CRC32 into
+``2**18`` buckets) and scored by a multinomial naive Bayes model trained
+from admin-labelled submissions.  Scoring is a gather plus ``bincount``
+over the hashed feature indices, so a chunk of submissions is scored in a
+handful of NumPy calls.
+
+Labels are copied into ``spam_labels`` so training data survives contact
+archiving; the trained model lives in ``spam_models``.
+"""
+import asyncio
+import logging
+import re
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 1 << 18
+TOKEN_PATTERN = re.compile(r"https?://|www\.|[a-z0-9']+|[$€£!]")
+MODEL_ID = "current"
+
+
+def submission_text(submission: Dict[str, Any]) -> str:
+    """The text a submission is scored on: name, sender domain and message"""
+    domain = submission.get("email", "").rsplit("@", 1)[-1]
+    return f"{submission.get('name', '')} domain:{domain} {submission.get('message', '')}"
+
+
+def _grams(text: str) -> List[bytes]:
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return [gram.encode() for gram in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]]
+
+
+def featurize(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Row and column indices of the sparse count matrix for a batch of texts"""
+    grams: List[bytes] = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for row, text in enumerate(texts):
+        text_grams = _grams(text)
+        lengths[row] = len(text_grams)
+        grams.extend(text_grams)
+    columns = np.fromiter(map(zlib.crc32, grams), dtype=np.uint32, count=len(grams)) & (N_FEATURES - 1)
+    return np.repeat(np.arange(len(texts)), lengths), columns
+
+
+class SpamModel:
+    """Multinomial naive Bayes reduced to a per-feature log-odds vector"""
+
+    __slots__ = ("weights", "bias", "trained_at", "n_spam", "n_ham")
+
+    def __init__(self, weights: np.ndarray, bias: float, trained_at: datetime, n_spam: int, n_ham: int):
+        self.weights = weights
+        self.bias = bias
+        self.trained_at = trained_at
+        self.n_spam = n_spam
+        self.n_ham = n_ham
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[bool], alpha: float = 1.0) -> "SpamModel":
+        labels = np.asarray(labels, dtype=bool)
+        n_spam = int(labels.sum())
+        n_ham = len(labels) - n_spam
+        if not n_spam or not n_ham:
+            raise ValueError("Training needs at least one spam and one non-spam example")
+        rows, columns = featurize(texts)
+        is_spam = labels[rows]
+        spam_counts = np.bincount(columns[is_spam], minlength=N_FEATURES) + alpha
+        ham_counts = np.bincount(columns[~is_spam], minlength=N_FEATURES) + alpha
+        weights = (np.log(spam_counts / spam_counts.sum()) - np.log(ham_counts / ham_counts.sum())).astype(np.float32)
+        return cls(weights, float(np.log(n_spam / n_ham)), datetime.utcnow(), n_spam, n_ham)
+
+    def score_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Spam probabilities for a batch of texts"""
+        rows, columns = featurize(texts)
+        log_odds = np.bincount(rows, weights=self.weights[columns], minlength=len(texts)) + self.bias
+        return 1.0 / (1.0 + np.exp(-np.clip(log_odds, -500, 500)))
+
+    def score(self, text: str) -> float:
+        return float(self.score_many([text])[0])
+
+    def to_document(self) -> Dict[str, Any]:
+        return {
+            "_id": MODEL_ID,
+            "weights": zlib.compress(self.weights.tobytes()),
+            "bias": self.bias,
+            "trained_at": self.trained_at,
+            "n_spam": self.n_spam,
+            "n_ham": self.n_ham,
+        }
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "SpamModel":
+        weights = np.frombuffer(zlib.decompress(document["weights"]), dtype=np.float32)
+        return cls(weights, document["bias"], document["trained_at"], document["n_spam"], document["n_ham"])
+
+
+class SpamClassifier:
+    """Holds the current model and persists labels, models and scores"""
+
+    def __init__(self, db, threshold: float = 0.9, chunk_size: int = 1000):
+        self.db = db
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self.model: Optional[SpamModel] = None
+
+    async def load(self):
+        document = await self.db.spam_models.find_one({"_id": MODEL_ID})
+        self.model = SpamModel.from_document(document) if document else None
+
+    def score(self, submission: Dict[str, Any]) -> Optional[float]:
+        if self.model is None:
+            return None
+        return round(self.model.score(submission_text(submission)), 4)
+
+    async def label(self, submission: Dict[str, Any], spam: bool):
+        await self.db.spam_labels.replace_one(
+            {"_id": submission["id"]},
+            {"text": submission_text(submission), "spam": spam, "labelled_at": datetime.utcnow()},
+            upsert=True,
+        )
+
+    async def train(self) -> SpamModel:
+        texts: List[str] = []
+        labels: List[bool] = []
+        async for label in self.db.spam_labels.find({}, {"text": 1, "spam": 1}):
+            texts.append(label["text"])
+            labels.append(label["spam"])
+        model = await asyncio.to_thread(SpamModel.train, texts, labels)
+        await self.db.spam_models.replace_one({"_id": MODEL_ID}, model.to_document(), upsert=True)
+        self.model = model
+        logger.info(f"Trained spam model on {model.n_spam} spam and {model.n_ham} non-spam submissions")
+        return model
+
+    async def rescore(self) -> int:
+        """Re-score every stored submission in chunks; returns the number updated"""
+        if self.model is None:
+            return 0
+        model = self.model
+        updated = 0
+        chunk: List[Dict[str, Any]] = []
+        projection = {"name": 1, "email": 1, "message": 1}
+        async for submission in self.db.contact_submissions.find({}, projection):
+            chunk.append(submission)
+            if len(chunk) >= self.chunk_size:
+                updated += await self._write_scores(model, chunk)
+                chunk = []
+        if chunk:
+            updated += await self._write_scores(model, chunk)
+        return updated
+
+    async def _write_scores(self, model: SpamModel, submissions: List[Dict[str, Any]]) -> int:
+        # Featurizing a chunk takes milliseconds; keep it off the event loop
+        scores = await asyncio.to_thread(model.score_many, [submission_text(s) for s in submissions])
+        result = await self.db.contact_submissions.bulk_write(
+            [
+                UpdateOne({"_id": s["_id"]}, {"$set": {"spam_score": round(float(score), 4)}})
+                for s, score in zip(submissions, scores)
+            ],
+            ordered=False,
+        )
+        return result.matched_count
+
+    def status(self) -> Dict[str, Any]:
+        if self.model is None:
+            return {"trained": False, "threshold": self.threshold}
+        return {
+            "trained": True,
+            "threshold": self.threshold,
+            "trained_at": self.model.trained_at,
+            "n_spam": self.model.n_spam,
+            "n_ham": self.model.n_ham,
+        }
+
+    def listing_filter(self, spam: bool) -> Dict[str, Any]:
+        """Query for submissions classified as spam (or not); admin labels win over scores"""
+        if spam:
+            return {"$or": [
+                {"spam_label": True},
+                {"spam_label": None, "spam_score": {"$gte": self.threshold}},
+            ]}
+        return {"$or": [
+            {"spam_label": False},
+            {"spam_label": None, "spam_score": {"$not": {"$gte": self.threshold}}},
+        ]}
@@ -0,0 +1,227 @@
+"""Tenant resolution and the per-tenant portfolio snapshot cache.
+
+Every ``portfolio_data`` and ``contact_submissions`` document carries a
+``tenant`` slug.  Requests pick their tenant from the ``X-Portfolio-Tenant``
+header or ``tenant`` query parameter, then from the ``Host`` header (matched
+against each portfolio's ``hosts`` list), and fall back to the default tenant.
+
+Portfolio documents are only held in memory while they are being served:
+:class:`TenantSnapshotCache` keeps them in LRU order under a byte budget, so
+idle tenants cost nothing and hot tenants stay resident.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+TENANT_HEADER = "x-portfolio-tenant"
+SLUG_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]{0,62}$')
+# Bound on artifacts cached per snapshot (e.g. encodings for several public base URLs)
+MAX_DERIVED_PER_SNAPSHOT = 32
+# Bound on remembered unknown tenants, so random slugs cannot grow memory without limit
+MAX_MISSING_TENANTS = 10000
+
+# Fields stored on portfolio documents that are not part of the public payload
+PORTFOLIO_PROJECTION = {"_id": 0, "tenant": 0, "hosts": 0}
+
+
+def is_valid_slug(slug: str) -> bool:
+    return bool(SLUG_PATTERN.match(slug))
+
+
+def normalize_host(host: str) -> str:
+    return host.split(":", 1)[0].strip().lower()
+
+
+async def ensure_tenant_indexes(db):
+    """Tag pre-tenancy documents with the default tenant and index the tenant keys"""
+    for collection in (db.portfolio_data, db.contact_submissions):
+        await collection.update_many({"tenant": {"$exists": False}}, {"$set": {"tenant": DEFAULT_TENANT}})
+    await db.portfolio_data.create_index([("tenant", ASCENDING)], name="tenant_unique", unique=True)
+    await db.portfolio_data.create_index([("hosts", ASCENDING)], name="hosts")
+    await db.contact_submissions.create_index(
+        [("tenant", ASCENDING), ("submitted_at", DESCENDING)], name="tenant_submitted_at"
+    )
+
+
+class TenantDirectory:
+    """In-memory map of custom hosts to tenant slugs"""
+
+    def __init__(self):
+        self._hosts: Dict[str, str] = {}
+
+    async def reload(self, db):
+        hosts = {}
+        async for doc in db.portfolio_data.find({"hosts.0": {"$exists": True}}, {"_id": 0, "tenant": 1, "hosts": 1}):
+            for host in doc["hosts"]:
+                hosts[normalize_host(host)] = doc["tenant"]
+        self._hosts = hosts
+
+    def knows_host(self, host: str) -> bool:
+        return normalize_host(host) in self._hosts
+
+    def resolve(self, explicit: Optional[str], host: Optional[str]) -> str:
+        if explicit:
+            return explicit.strip().lower()
+        if host:
+            return self._hosts.get(normalize_host(host), DEFAULT_TENANT)
+        return DEFAULT_TENANT
+
+
+class TenantSnapshot:
+    """An immutable portfolio document plus artifacts derived from it"""
+
+    __slots__ = ("tenant", "data", "version", "size", "loaded_at", "derived")
+
+    def __init__(self, tenant: str, data: Dict[str, Any]):
+        encoded = json.dumps(data, sort_keys=True, default=str).encode()
+        self.tenant = tenant
+        self.data = data
+        self.version = hashlib.sha1(encoded).hexdigest()[:16]
+        # Sizes are estimated from the JSON encoding of the document
+        self.size = len(encoded)
+        self.loaded_at = time.monotonic()
+        self.derived: Dict[str, bytes] = {}
+
+
+class TenantSnapshotCache:
+    """LRU cache of tenant snapshots bounded by an approximate memory budget"""
+
+    def __init__(self, loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+                 max_bytes: int, ttl_seconds: float, miss_ttl_seconds: float = 30.0):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        # Tenants recently found not to exist -> time of the lookup
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._entries: "OrderedDict[str, TenantSnapshot]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # In-flight loads that raced a put/invalidate/clear; their result is not installed
+        self._stale: Set[asyncio.Task] = set()
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, tenant: str) -> Optional[TenantSnapshot]:
+        """Return the tenant's snapshot, loading it (once, for concurrent callers) on a miss"""
+        snapshot = self._entries.get(tenant)
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl_seconds:
+            self._entries.move_to_end(tenant)
+            return snapshot
+        missed_at = self._missing.get(tenant)
+        if missed_at is not None:
+            if time.monotonic() - missed_at < self.miss_ttl_seconds:
+                return None
+            del self._missing[tenant]
+
+        task = self._inflight.get(tenant)
+        if task is None:
+            task = asyncio.ensure_future(self._load(tenant))
+            self._inflight[tenant] = task
+            task.add_done_callback(lambda done: self._finished(tenant, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, tenant: str, task: asyncio.Task):
+        self._stale.discard(task)
+        if self._inflight.get(tenant) is task:
+            del self._inflight[tenant]
+
+    async def _load(self, tenant: str) -> Optional[TenantSnapshot]:
+        data = await self.loader(tenant)
+        if asyncio.current_task() in self._stale:
+            # Written or invalidated while loading: the loaded document may predate that change
+            current = self._entries.get(tenant)
+            if current is not None:
+                return current
+            return TenantSnapshot(tenant, data) if data is not None else None
+        if data is None:
+            self._remove(tenant)
+            self._missing[tenant] = time.monotonic()
+            if len(self._missing) > MAX_MISSING_TENANTS:
+                self._missing.popitem(last=False)
+            return None
+        snapshot = TenantSnapshot(tenant, data)
+        resident = self._entries.get(tenant)
+        if resident is not None and resident.version == snapshot.version:
+            # Unchanged since the last load: keep the rendered artifacts, just restart the TTL
+            resident.loaded_at = snapshot.loaded_at
+            self._entries.move_to_end(tenant)
+            return resident
+        return self.put(tenant, data)
+
+    def put(self, tenant: str, data: Dict[str, Any]) -> TenantSnapshot:
+        """Install a freshly written document without waiting for a reload"""
+        self.invalidate(tenant)
+        snapshot = TenantSnapshot(tenant, data)
+        self._entries[tenant] = snapshot
+        self._bytes += snapshot.size
+        self._evict()
+        return snapshot
+
+    def derive(self, snapshot: TenantSnapshot, key: str, build: Callable[[], bytes]) -> bytes:
+        """Return an artifact cached on the snapshot, building and accounting for it once"""
+        value = snapshot.derived.get(key)
+        if value is None:
+            value = build()
+            if len(snapshot.derived) >= MAX_DERIVED_PER_SNAPSHOT:
+                return value
+            snapshot.derived[key] = value
+            snapshot.size += len(value)
+            if self._entries.get(snapshot.tenant) is snapshot:
+                self._bytes += len(value)
+                self._evict()
+        return value
+
+    def clear_derived(self, tenant: Optional[str] = None):
+        """Drop the artifacts cached on one tenant's snapshot, or on all of them"""
+        if tenant is None:
+            snapshots = list(self._entries.values())
+        else:
+            snapshots = [self._entries[tenant]] if tenant in self._entries else []
+        for snapshot in snapshots:
+            released = sum(len(value) for value in snapshot.derived.values())
+            snapshot.derived.clear()
+            snapshot.size -= released
+            self._bytes -= released
+
+    def clear(self):
+        self._entries.clear()
+        self._missing.clear()
+        self._bytes = 0
+        self._stale.update(self._inflight.values())
+        self._inflight.clear()
+
+    def invalidate(self, tenant: str):
+        self._missing.pop(tenant, None)
+        # A load that started before this change must not be installed or joined
+        task = self._inflight.pop(tenant, None)
+        if task is not None:
+            self._stale.add(task)
+        self._remove(tenant)
+
+    def _remove(self, tenant: str):
+        snapshot = self._entries.pop(tenant, None)
+        if snapshot is not None:
+            self._bytes -= snapshot.size
+
+    def _evict(self):
+        # Always keep the most recently used snapshot, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            tenant, snapshot = self._entries.popitem(last=False)
+            self._bytes -= snapshot.size
+            logger.debug(f"Evicted portfolio snapshot for tenant {tenant}")
@@ -7,7 +7,10 @@ Tests all API endpoints, validation, error handling, and database integration
 import requests
 import json
 import sys
+import asyncio
+import tempfile
 from datetime import datetime
+from pathlib import Path
 import os
 from dotenv import load_dotenv
 
@@ -18,6 +21,9 @@ load_dotenv('/app/frontend/.env')
 BACKEND_URL = os.getenv('REACT_APP_BACKEND_URL', 'https://420b0595-1fc6-4927-ad67-752e2507119e.preview.emergentagent.com')
 API_BASE_URL = f"{BACKEND_URL}/api"
 
+# Local backend sources, for checks that run in-process against fixture files
+BACKEND_DIR = Path(__file__).resolve().parent / 'backend'
+
 class Colors:
     GREEN = '\033[92m'
     RED = '\033[91m'
@@ -401,6 +407,483 @@ class PortfolioAPITester:
         except requests.exceptions.RequestException as e:
             self.log_result("Database Integration", False, f"Request failed: {str(e)}")
 
+    def test_media_cache(self):
+        """Test GET /api/media/{hash}/{width} - Locally cached portfolio images"""
+        print_test_header("Media Cache Endpoint")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/portfolio")
+            if response.status_code != 200:
+                self.log_result("Media Cache", False, 
+                              f"Could not load portfolio (status: {response.status_code})")
+                return
+            
+            images = [p.get('image', '') for p in response.json().get('projects', [])]
+            media_urls = [url for url in images if '/api/media/' in url]
+            if not media_urls:
+                print_warning("No project images rewritten to /api/media yet (ingestion may still be running)")
+                return
+            
+            response = self.session.get(media_urls[0], headers={'Accept': 'image/webp,image/*'})
+            cache_control = response.headers.get('Cache-Control', '')
+            if response.status_code == 200 and 'immutable' in cache_control:
+                self.log_result("Media Cache", True, 
+                              f"Served {response.headers.get('Content-Type')} variant with long-lived cache headers")
+            else:
+                self.log_result("Media Cache", False, 
+                              f"Unexpected media response: {response.status_code} (Cache-Control: {cache_control})")
+            
+            response = self.session.get(f"{self.base_url}/media/{'0' * 64}/400")
+            if response.status_code == 404:
+                self.log_result("Media Cache Miss", True, "Unknown image hash correctly returns 404")
+            else:
+                self.log_result("Media Cache Miss", False, 
+                              f"Expected 404 for unknown hash, got {response.status_code}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Media Cache", False, f"Request failed: {str(e)}")
+
+    def test_media_fixtures(self):
+        """Test media ingestion in-process against the fixture images in backend/fixtures/images"""
+        print_test_header("Media Fixture Ingestion")
+        
+        sys.path.insert(0, str(BACKEND_DIR))
+        try:
+            from media import MediaStore, VARIANT_FORMATS
+        except ImportError as e:
+            print_warning(f"Skipping fixture ingestion (backend dependencies not installed: {e})")
+            return
+        
+        fixture_dir = BACKEND_DIR / 'fixtures' / 'images'
+        rejected_sources = [
+            '/etc/passwd',
+            '../../server.py',
+            'file:///etc/hostname',
+            'http://169.254.169.254/latest/meta-data/',
+            'ftp://example.com/image.jpg',
+        ]
+        
+        async def run(store):
+            ingested = {}
+            for fixture in sorted(fixture_dir.iterdir()):
+                ingested[fixture.name] = await store.ingest(fixture.name)
+            rejected = []
+            for source in rejected_sources:
+                try:
+                    await store.ingest(source)
+                except ValueError:
+                    rejected.append(source)
+            return ingested, rejected
+        
+        with tempfile.TemporaryDirectory() as root:
+            store = MediaStore(root=Path(root), widths=[100, 400], max_workers=1, fixture_dir=fixture_dir)
+            store.open()
+            try:
+                ingested, rejected = asyncio.run(run(store))
+            finally:
+                store.close()
+            
+            variants = [store.variant_path(digest, width, media_type)
+                        for digest in ingested.values()
+                        for width in store.widths
+                        for media_type in VARIANT_FORMATS]
+            if ingested and all(path.exists() for path in variants):
+                self.log_result("Media Fixture Ingestion", True, 
+                              f"Ingested {len(ingested)} fixture images into {len(variants)} variants")
+            else:
+                self.log_result("Media Fixture Ingestion", False, 
+                              f"Missing variants for fixtures: {sorted(ingested)}")
+            
+            if rejected == rejected_sources:
+                self.log_result("Media Source Restrictions", True, 
+                              "Paths outside the fixture directory and non-allowed hosts rejected")
+            else:
+                self.log_result("Media Source Restrictions", False, 
+                              f"Not rejected: {sorted(set(rejected_sources) - set(rejected))}")
+
+    def test_read_routing(self):
+        """Test read preference/concern routing; against a replica set if MONGO_REPLICA_SET_URL is set"""
+        print_test_header("Read Routing")
+        
+        sys.path.insert(0, str(BACKEND_DIR))
+        try:
+            from pymongo import MongoClient, monitoring
+            from read_routing import describe, routed_databases
+        except ImportError as e:
+            print_warning(f"Skipping read routing checks (backend dependencies not installed: {e})")
+            return
+        
+        replica_set_url = os.getenv('MONGO_REPLICA_SET_URL')
+        
+        class ReadAddresses(monitoring.CommandListener):
+            def __init__(self):
+                self.addresses = []
+            
+            def started(self, event):
+                if event.command_name == 'find':
+                    self.addresses.append(event.connection_id)
+            
+            def succeeded(self, event):
+                pass
+            
+            def failed(self, event):
+                pass
+        
+        listener = ReadAddresses()
+        client = MongoClient(replica_set_url or 'mongodb://localhost:27017/?replicaSet=rs0', connect=False,
+                             event_listeners=[listener], serverSelectionTimeoutMS=5000)
+        try:
+            environ = {'READ_CONCERN_ANALYTICS': 'majority', 'MONGO_MAX_STALENESS_SECONDS': '120'}
+            read_dbs = routed_databases(client, 'routing_test', environ)
+            expected = ("portfolio=secondaryPreferred/local, analytics=secondaryPreferred/majority, "
+                        "primary=primary/local")
+            staleness = read_dbs['portfolio'].portfolio_data.read_preference.max_staleness
+            if describe(read_dbs) == expected and staleness == 120:
+                self.log_result("Read Routing Config", True, expected)
+            else:
+                self.log_result("Read Routing Config", False, 
+                              f"Got {describe(read_dbs)} (max staleness {staleness})")
+            
+            try:
+                routed_databases(client, 'routing_test', {'MONGO_MAX_STALENESS_SECONDS': '30'})
+                self.log_result("Read Routing Staleness Limit", False, "Max staleness below 90s was accepted")
+            except ValueError:
+                self.log_result("Read Routing Staleness Limit", True, "Max staleness below 90s rejected")
+            
+            if not replica_set_url:
+                print_info("Set MONGO_REPLICA_SET_URL (see backend/docker-compose.replicaset.yml) "
+                           "to check which members serve the reads")
+                return
+            
+            read_dbs['primary'].routing_checks.insert_one({'check': 'read-routing'})
+            read_dbs['primary'].routing_checks.find_one({'check': 'read-routing'})
+            read_dbs['portfolio'].routing_checks.find_one({})
+            primary_read, portfolio_read = listener.addresses[-2:]
+            if primary_read == client.primary and portfolio_read in client.secondaries:
+                self.log_result("Read Routing Members", True, 
+                              f"Primary route read from {primary_read}, portfolio route from {portfolio_read}")
+            else:
+                self.log_result("Read Routing Members", False, 
+                              f"Primary route read from {primary_read}, portfolio route from {portfolio_read} "
+                              f"(primary {client.primary}, secondaries {sorted(client.secondaries)})")
+            read_dbs['primary'].routing_checks.drop()
+        except Exception as e:
+            self.log_result("Read Routing", False, f"Check failed: {str(e)}")
+        finally:
+            client.close()
+
+    def test_contact_export(self):
+        """Test GET /api/admin/contacts/export - Archived + hot contact submissions as NDJSON"""
+        print_test_header("Contact Export Endpoint")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/admin/contacts/export", 
+                                      headers={'Accept': 'application/x-ndjson'})
+            
+            if response.status_code == 200 and 'ndjson' in response.headers.get('Content-Type', ''):
+                lines = [line for line in response.text.splitlines() if line]
+                records = [json.loads(line) for line in lines]
+                if all('id' in record and 'submitted_at' in record for record in records):
+                    self.log_result("Contact Export", True, 
+                                  f"Exported {len(records)} contact submissions as NDJSON")
+                else:
+                    self.log_result("Contact Export", False, "Exported records missing id/submitted_at")
+            else:
+                self.log_result("Contact Export", False, 
+                              f"Unexpected response: {response.status_code} {response.headers.get('Content-Type')}")
+                
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.log_result("Contact Export", False, f"Request failed: {str(e)}")
+
+    def test_contact_archive(self):
+        """Test contact archival in-process: archive_once, then read back what the export streams"""
+        print_test_header("Contact Archive Round Trip")
+        
+        sys.path.insert(0, str(BACKEND_DIR))
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+            from retention import ContactArchiver
+        except ImportError as e:
+            print_warning(f"Skipping archive round trip (mongomock_motor or backend dependencies not installed: {e})")
+            return
+        
+        now = datetime(2025, 6, 1, 12, 0, 0)
+        expired = [{
+            'id': f'archived-{i}',
+            'name': f'Sender {i}',
+            'email': f'sender{i}@example.com',
+            'message': 'An old submission past the retention window',
+            'status': 'new',
+            'tenant': 'default',
+            'submitted_at': datetime(2024, 1, 1, 9, 0, i),
+        } for i in range(5)]
+        recent = dict(expired[0], id='recent', submitted_at=datetime(2025, 5, 30, 9, 0, 0))
+        
+        async def run(archiver):
+            collection = archiver.db.contact_submissions
+            await collection.insert_many([dict(doc) for doc in expired + [recent]])
+            archived = await archiver.archive_once(now=now)
+            hot = await collection.find({}, {'_id': 0, 'id': 1}).to_list(None)
+            return archived, [doc['id'] for doc in hot]
+        
+        with tempfile.TemporaryDirectory() as archive_dir:
+            archiver = ContactArchiver(AsyncMongoMockClient()['archive_test'], Path(archive_dir),
+                                       retention_days=180, chunk_size=2)
+            archived, hot_ids = asyncio.run(run(archiver))
+            chunks = archiver.chunks_between(None, None)
+            records = [record for chunk in chunks
+                       for record in archiver.read_chunk(chunk, None, None, 'default', 'default')]
+            leftovers = [path.name for path in Path(archive_dir).iterdir() if path.name.endswith('.tmp')]
+        
+        if archived == len(expired) and hot_ids == ['recent']:
+            self.log_result("Contact Archival", True, 
+                          f"Moved {archived} expired submissions into {len(chunks)} chunks")
+        else:
+            self.log_result("Contact Archival", False, 
+                          f"Archived {archived}, still in MongoDB: {hot_ids}")
+        
+        if records == expired and not leftovers:
+            self.log_result("Contact Archive Export", True, 
+                          "Archived submissions read back unchanged, oldest first")
+        else:
+            self.log_result("Contact Archive Export", False, 
+                          f"Read back {len(records)} of {len(expired)} submissions (temp files left: {leftovers})")
+
+    def test_contact_stats(self):
+        """Test GET /api/admin/contacts/stats - Pre-aggregated contact analytics"""
+        print_test_header("Contact Stats Endpoint")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/admin/contacts/stats")
+            
+            if response.status_code == 200:
+                stats = response.json()
+                required_fields = ['total', 'per_day', 'per_week', 'by_status', 'top_domains']
+                missing_fields = [field for field in required_fields if field not in stats]
+                if not missing_fields and len(stats['per_day']) == 30:
+                    self.log_result("Contact Stats", True, 
+                                  f"{stats['total']} submissions in the last 30 days")
+                    print_info(f"By status: {stats['by_status']}")
+                else:
+                    self.log_result("Contact Stats", False, 
+                                  f"Unexpected stats shape (missing: {missing_fields})")
+            else:
+                self.log_result("Contact Stats", False, 
+                              f"Unexpected status code: {response.status_code}")
+            
+            response = self.session.get(f"{self.base_url}/admin/contacts/stats", 
+                                      params={'since': '2024-02-01', 'until': '2024-01-01'})
+            if response.status_code == 400:
+                self.log_result("Contact Stats Range", True, "Inverted range correctly rejected")
+            else:
+                self.log_result("Contact Stats Range", False, 
+                              f"Expected 400 for inverted range, got {response.status_code}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Contact Stats", False, f"Request failed: {str(e)}")
+
+    def test_tenant_resolution(self):
+        """Test tenant selection for GET /api/portfolio"""
+        print_test_header("Tenant Resolution")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/portfolio", 
+                                      headers={'X-Portfolio-Tenant': 'tenant-that-does-not-exist'})
+            if response.status_code == 404:
+                self.log_result("Unknown Tenant", True, "Unknown tenant correctly returns 404")
+            else:
+                self.log_result("Unknown Tenant", False, 
+                              f"Expected 404 for unknown tenant, got {response.status_code}")
+            
+            response = self.session.get(f"{self.base_url}/portfolio", params={'tenant': 'not a slug!'})
+            if response.status_code == 400:
+                self.log_result("Invalid Tenant", True, "Invalid tenant slug correctly rejected")
+            else:
+                self.log_result("Invalid Tenant", False, 
+                              f"Expected 400 for invalid tenant slug, got {response.status_code}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Tenant Resolution", False, f"Request failed: {str(e)}")
+
+    def test_tenant_admin(self):
+        """Test PUT /api/admin/tenants/{slug}/portfolio - Requires the ADMIN_TOKEN bearer token"""
+        print_test_header("Tenant Administration")
+        
+        tenant_url = f"{self.base_url}/admin/tenants/backend-test/portfolio"
+        try:
+            portfolio = self.session.get(f"{self.base_url}/portfolio").json()
+            
+            response = self.session.put(tenant_url, json=portfolio)
+            if response.status_code in (401, 403):
+                self.log_result("Tenant Write Without Token", True, 
+                              f"Unauthenticated tenant write rejected ({response.status_code})")
+            else:
+                self.log_result("Tenant Write Without Token", False, 
+                              f"Expected 401/403 without a token, got {response.status_code}")
+            
+            admin_token = os.getenv('ADMIN_TOKEN')
+            if not admin_token:
+                print_warning("Skipping authenticated tenant writes (ADMIN_TOKEN not set)")
+                return
+            auth = {'Authorization': f'Bearer {admin_token}'}
+            
+            response = self.session.put(f"{self.base_url}/admin/tenants/default/portfolio", 
+                                      json=portfolio, headers=auth)
+            if response.status_code == 403:
+                self.log_result("Default Tenant Write", True, "Default portfolio write correctly refused")
+            else:
+                self.log_result("Default Tenant Write", False, 
+                              f"Expected 403 for the default tenant, got {response.status_code}")
+            
+            response = self.session.put(tenant_url, json=portfolio, headers=auth)
+            served = self.session.get(f"{self.base_url}/portfolio", 
+                                    headers={'X-Portfolio-Tenant': 'backend-test'})
+            if response.status_code == 200 and served.status_code == 200:
+                self.log_result("Tenant Write", True, "Tenant portfolio saved and served")
+            else:
+                self.log_result("Tenant Write", False, 
+                              f"Unexpected responses: PUT {response.status_code}, GET {served.status_code}")
+                
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.log_result("Tenant Administration", False, f"Request failed: {str(e)}")
+
+    def test_binary_encodings(self):
+        """Test Accept-based MessagePack/CBOR negotiation on GET /api/portfolio"""
+        print_test_header("Binary Response Encodings")
+        
+        for media_type in ['application/msgpack', 'application/cbor']:
+            try:
+                response = self.session.get(f"{self.base_url}/portfolio", headers={'Accept': media_type})
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code == 200 and content_type.startswith(media_type):
+                    self.log_result(f"Encoding {media_type}", True, 
+                                  f"Received {len(response.content)} byte {media_type} body")
+                else:
+                    self.log_result(f"Encoding {media_type}", False, 
+                                  f"Unexpected response: {response.status_code} {content_type}")
+                    
+            except requests.exceptions.RequestException as e:
+                self.log_result(f"Encoding {media_type}", False, f"Request failed: {str(e)}")
+
+    def test_request_id(self):
+        """Test that responses echo the X-Request-ID used in the access log"""
+        print_test_header("Request ID Propagation")
+        
+        try:
+            request_id = f"backend-test-{datetime.now().strftime('%H%M%S')}"
+            response = self.session.get(f"{self.base_url}/", headers={'X-Request-ID': request_id})
+            if response.headers.get('X-Request-ID') == request_id:
+                self.log_result("Request ID", True, f"Request ID {request_id} echoed back")
+            else:
+                self.log_result("Request ID", False, 
+                              f"Expected X-Request-ID {request_id}, got {response.headers.get('X-Request-ID')}")
+            
+            response = self.session.get(f"{self.base_url}/")
+            if response.headers.get('X-Request-ID'):
+                self.log_result("Generated Request ID", True, "Server generated a request ID")
+            else:
+                self.log_result("Generated Request ID", False, "Response missing X-Request-ID header")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Request ID", False, f"Request failed: {str(e)}")
+
+    def test_status_rollups(self):
+        """Test POST /api/status followed by GET /api/status/rollups (and the legacy GET /api/status)"""
+        print_test_header("Status Heartbeat Rollups")
+        
+        try:
+            client_name = "backend-test"
+            response = self.session.post(f"{self.base_url}/status", json={'client_name': client_name})
+            if response.status_code != 200:
+                self.log_result("Status Heartbeat", False, 
+                              f"Unexpected status code: {response.status_code}")
+                return
+            self.log_result("Status Heartbeat", True, "Heartbeat accepted")
+            
+            response = self.session.get(f"{self.base_url}/status/rollups", 
+                                      params={'granularity': 'hour', 'client_name': client_name})
+            if response.status_code == 200 and 'clients' in response.json():
+                clients = response.json()['clients']
+                self.log_result("Status Rollups", True, 
+                              f"Rollups returned for {len(clients)} client(s) (heartbeats appear after the next flush)")
+            else:
+                self.log_result("Status Rollups", False, 
+                              f"Unexpected status code: {response.status_code}")
+            
+            response = self.session.get(f"{self.base_url}/status")
+            if response.status_code == 410 or (response.status_code == 200 and isinstance(response.json(), list)):
+                self.log_result("Legacy Status Listing", True, 
+                              f"GET /api/status returned {response.status_code} (410 unless STATUS_STORE_RAW is on)")
+            else:
+                self.log_result("Legacy Status Listing", False, 
+                              f"Expected 410 or a list, got {response.status_code}")
+            
+            response = self.session.get(f"{self.base_url}/status/rollups", params={'granularity': 'fortnight'})
+            if response.status_code == 400:
+                self.log_result("Status Rollups Granularity", True, "Unknown granularity correctly rejected")
+            else:
+                self.log_result("Status Rollups Granularity", False, 
+                              f"Expected 400 for unknown granularity, got {response.status_code}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Status Rollups", False, f"Request failed: {str(e)}")
+
+    def test_portfolio_snapshot(self):
+        """Test the server-rendered HTML snapshot and its ETag revalidation"""
+        print_test_header("Portfolio HTML Snapshot")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/portfolio/snapshot.html")
+            etag = response.headers.get('ETag')
+            if response.status_code == 200 and response.headers.get('Content-Type', '').startswith('text/html') and etag:
+                self.log_result("Portfolio Snapshot", True, 
+                              f"Received {len(response.content)} byte page ({response.headers.get('Content-Encoding', 'identity')})")
+            else:
+                self.log_result("Portfolio Snapshot", False, 
+                              f"Unexpected response: {response.status_code} {response.headers.get('Content-Type')}")
+                return
+            
+            response = self.session.get(f"{self.base_url}/portfolio/snapshot.html", headers={'If-None-Match': etag})
+            if response.status_code == 304:
+                self.log_result("Portfolio Snapshot ETag", True, "Unchanged snapshot answered with 304")
+            else:
+                self.log_result("Portfolio Snapshot ETag", False, 
+                              f"Expected 304 for matching ETag, got {response.status_code}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Portfolio Snapshot", False, f"Request failed: {str(e)}")
+
+    def test_spam_scoring(self):
+        """Test spam labelling, the spam model status and the spam listing filter"""
+        print_test_header("Spam Scoring")
+        
+        try:
+            response = self.session.get(f"{self.base_url}/admin/spam")
+            if response.status_code == 200 and 'trained' in response.json():
+                self.log_result("Spam Model Status", True, 
+                              f"Model trained: {response.json()['trained']}")
+            else:
+                self.log_result("Spam Model Status", False, 
+                              f"Unexpected status code: {response.status_code}")
+            
+            response = self.session.post(f"{self.base_url}/admin/contacts/does-not-exist/label", json={'spam': True})
+            if response.status_code == 404:
+                self.log_result("Spam Label Unknown Submission", True, "Unknown submission correctly rejected")
+            else:
+                self.log_result("Spam Label Unknown Submission", False, 
+                              f"Expected 404, got {response.status_code}")
+            
+            response = self.session.get(f"{self.base_url}/admin/contacts", params={'spam': 'false'})
+            if response.status_code == 200 and isinstance(response.json(), list):
+                self.log_result("Spam Listing Filter", True, 
+                              f"{len(response.json())} non-spam submissions listed")
+            else:
+                self.log_result("Spam Listing Filter", False, 
+                              f"Unexpected status code: {response.status_code}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_result("Spam Scoring", False, f"Request failed: {str(e)}")
+
     def run_all_tests(self):
         """Run all API tests"""
         print(f"{Colors.BOLD}{Colors.BLUE}")
@@ -418,6 +901,19 @@ class PortfolioAPITester:
         self.test_contact_form_validation()
         self.test_error_handling()
         self.test_database_integration()
+        self.test_media_cache()
+        self.test_media_fixtures()
+        self.test_read_routing()
+        self.test_contact_export()
+        self.test_contact_archive()
+        self.test_contact_stats()
+        self.test_tenant_resolution()
+        self.test_tenant_admin()
+        self.test_binary_encodings()
+        self.test_request_id()
+        self.test_status_rollups()
+        self.test_portfolio_snapshot()
+        self.test_spam_scoring()
         
         # Print summary
         self.print_summary()